@@ -0,0 +1,70 @@
+"""Latency of /search_deals queries on the DealSearchIndex, vs scanning every deal's text, at 1M deals.
+
+Nearby queries are limited to the NEARBY_RESTAURANTS closest restaurants like
+the route does, global ones search every restaurant.
+
+Run from flask_server/: `python benchmarks/bench_deal_search.py`
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from deal_search import DealSearchIndex, tokenize
+
+DEALS = 1_000_000
+DEALS_PER_RESTAURANT = 5
+NEARBY_RESTAURANTS = 200
+QUERIES = ["wings", "half price pizza", "piza", "bogo burrito tuesday", "free coffee with breakfast"]
+
+FOODS = [
+    "pizza", "wings", "burger", "burrito", "taco", "sushi", "ramen", "pho", "coffee", "latte", "donut", "bagel",
+    "shawarma", "poutine", "fries", "salad", "sandwich", "noodles", "dumplings", "curry", "bubble tea", "ice cream",
+]
+OFFERS = ["half price", "bogo", "free", "two for one", "10% off", "$5", "student discount", "happy hour"]
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "weekend", "breakfast", "lunch", "late night"]
+
+def make_deals():
+    rng = np.random.default_rng(0)
+    foods = rng.integers(0, len(FOODS), size=(DEALS, 2))
+    offers = rng.integers(0, len(OFFERS), size=DEALS)
+    days = rng.integers(0, len(DAYS), size=DEALS)
+    for i in range(DEALS):
+        item = f"{OFFERS[offers[i]]} {FOODS[foods[i, 0]]}"
+        description = f"{FOODS[foods[i, 1]]} every {DAYS[days[i]]} with any order at location {i % 997}"
+        yield f"deal-{i:08d}", i // DEALS_PER_RESTAURANT, item, description
+
+def scan(deals, query, restaurants):
+    """What a search would cost without the index, every deal's text tokenized and checked."""
+    words = set(tokenize(query))
+    return [
+        deal_id for deal_id, restaurant_id, item, description in deals
+        if (restaurants is None or restaurant_id in restaurants) and words & set(tokenize(item) + tokenize(description))
+    ]
+
+def best_of(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    index = DealSearchIndex()
+    start = time.perf_counter()
+    for deal in make_deals():
+        index.add(*deal)
+    print(f"Indexed {len(index)} deals in {time.perf_counter() - start:.1f}s")
+
+    nearby = {restaurant_id: 1.0 for restaurant_id in range(NEARBY_RESTAURANTS)}
+    sample = [deal for deal, _ in zip(make_deals(), range(100_000))]
+
+    print(f"{'query':>28} {'nearby (ms)':>12} {'global (ms)':>12} {'scan 100k (ms)':>15}")
+    for query in QUERIES:
+        nearby_time = best_of(index.search, query, nearby, 20)
+        global_time = best_of(index.search, query, None, 20, repeat=3)
+        scan_time = best_of(scan, sample, query, None, repeat=1)
+        print(f"{query:>28} {nearby_time * 1000:>12.2f} {global_time * 1000:>12.1f} {scan_time * 1000:>15.1f}")
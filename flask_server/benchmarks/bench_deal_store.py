@@ -0,0 +1,127 @@
+"""Memory and latency of the deal snapshot: nested dicts vs DealRecord/RestaurantRecord, at 100k deals.
+
+The dict pipeline is the one the snapshot used before the records: one dict
+per restaurant and deal kept resident, every request copies them and parses
+the ISO timestamps again in format_deal.
+
+Run from flask_server/: `python benchmarks/bench_deal_store.py`
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import numpy as np
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import json_stream
+from deal_records import build_restaurant_records, parse_iso_ms
+from sweeper import BAD_KARMA_THRESHOLD
+
+DEALS = 100_000
+DEALS_PER_RESTAURANT = 5
+NEARBY_RESTAURANTS = 200  # a typical /restaurant_deals response
+TYPES = ["BOGO", "FREE", "DISCOUNT", "OTHER"]
+GROUPS = ["UNDER_18", "STUDENT", "SENIOR", "LOYALTY_MEMBER", "NEW_USER", "BIRTHDAY", "EVERYONE"]
+
+def make_rpc_rows():
+    rng = np.random.default_rng(0)
+    now = datetime.now(tz=pytz.UTC)
+    rows = []
+    for i in range(DEALS):
+        restaurant = i // DEALS_PER_RESTAURANT
+        rows.append({
+            "restaurant_id": restaurant, "place_id": f"place{restaurant}",
+            "latitude": 43.47 + rng.uniform(-0.5, 0.5), "longitude": -80.54 + rng.uniform(-0.5, 0.5),
+            "restaurant_name": f"Restaurant {restaurant}", "display_address": f"{restaurant} King St",
+            "image_url": f"https://logo.clearbit.com/r{restaurant}.com",
+            "id": f"deal-{i:08d}", "item": f"Item {i}", "description": "Two for one on weekdays",
+            "type": TYPES[i % 4], "expiry_date": (now + timedelta(days=int(rng.integers(1, 60)))).isoformat(),
+            "date_posted": (now - timedelta(days=int(rng.integers(0, 60)))).isoformat(),
+            "user_id": f"user{i % 1000}", "username": f"user{i % 1000}", "price": round(float(rng.uniform(1, 30)), 2),
+            "image_id": None, "user_saved": False, "user_vote": None, "applicable_group": GROUPS[i % 7],
+            "start_times": [660] * 7, "end_times": [1320] * 7, "upvotes": int(rng.integers(0, 20)), "downvotes": int(rng.integers(0, 5)),
+        })
+    return rows
+
+# The dict pipeline, as it was
+
+def group_deals_by_restaurant(rows):
+    restaurant_map = {}
+    for deal in rows:
+        restaurant = restaurant_map.setdefault(deal["restaurant_id"], {
+            "id": deal["restaurant_id"], "place_id": deal["place_id"],
+            "coordinates": {"latitude": deal["latitude"], "longitude": deal["longitude"]},
+            "restaurant_name": deal["restaurant_name"], "display_address": deal["display_address"],
+            "image_url": deal["image_url"], "Deal": [],
+        })
+        restaurant["Deal"].append({
+            "id": deal["id"], "item": deal["item"], "description": deal["description"], "type": deal["type"],
+            "expiry_date": deal["expiry_date"], "date_posted": deal["date_posted"], "user_id": deal["user_id"],
+            "username": deal["username"], "price": deal["price"], "image_id": deal["image_id"],
+            "user_saved": deal["user_saved"], "user_vote": deal["user_vote"], "applicable_group": deal["applicable_group"],
+            "daily_start_times": deal["start_times"], "daily_end_times": deal["end_times"],
+            "num_upvote": deal["upvotes"], "num_downvote": deal["downvotes"],
+        })
+    return list(restaurant_map.values())
+
+def format_deal(deal):
+    deal["date_posted"] = parse_iso_ms(deal["date_posted"])
+    if deal.get("expiry_date"):
+        deal["expiry_date"] = parse_iso_ms(deal["expiry_date"])
+        if datetime.fromtimestamp(deal["expiry_date"] / 1000, tz=pytz.UTC) < datetime.now(tz=pytz.UTC):
+            return None
+    if deal["num_downvote"] - deal["num_upvote"] >= BAD_KARMA_THRESHOLD:
+        return None
+    return deal
+
+def dict_pipeline(restaurants):
+    response = []
+    for restaurant in restaurants:
+        restaurant = dict(restaurant)
+        restaurant["Deal"] = list(filter(None, (format_deal(dict(deal)) for deal in restaurant["Deal"])))
+        response.append(restaurant)
+    return response
+
+def record_pipeline(restaurants):
+    now_ms = int(time.time() * 1000)
+    return [
+        restaurant.to_dict([deal.to_dict() for deal in restaurant.deals if deal.is_live(now_ms)])
+        for restaurant in restaurants
+    ]
+
+def resident_size(build, rows):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build(rows)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return store, size
+
+def best_of(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    rows = make_rpc_rows()
+
+    dict_store, dict_size = resident_size(group_deals_by_restaurant, rows)
+    record_store, record_size = resident_size(build_restaurant_records, rows)
+    # both serialize to the same JSON
+    assert json_stream.dumps(dict_pipeline(dict_store[:50])) == json_stream.dumps(record_pipeline(record_store[:50]))
+
+    print(f"{DEALS} deals in {DEALS // DEALS_PER_RESTAURANT} restaurants")
+    print(f"{'store':>8} {'resident (MB)':>14} {'nearby response (ms)':>21} {'full response (ms)':>19}")
+    for name, store, size, pipeline in [
+        ("dicts", dict_store, dict_size, dict_pipeline),
+        ("records", record_store, record_size, record_pipeline),
+    ]:
+        nearby_time = best_of(pipeline, store[:NEARBY_RESTAURANTS], repeat=20)
+        full_time = best_of(pipeline, store, repeat=3)
+        print(f"{name:>8} {size / 2**20:>14.1f} {nearby_time * 1000:>21.2f} {full_time * 1000:>19.1f}")
@@ -0,0 +1,50 @@
+"""Micro-benchmark: scalar haversine loop vs the vectorized bounding-box + haversine path.
+
+Run from flask_server/: `python benchmarks/bench_distance.py`
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from distance import haversine, within_radius
+
+USER_LAT, USER_LONG = 43.4723, -80.5449  # Waterloo
+RADIUS = 5000
+SIZES = [10_000, 100_000, 1_000_000]
+
+def scalar_filter(latitudes, longitudes):
+    return [i for i, (lat, long) in enumerate(zip(latitudes, longitudes))
+            if haversine(lat, long, USER_LAT, USER_LONG) <= RADIUS]
+
+def vectorized_filter(latitudes, longitudes):
+    indices, _ = within_radius(USER_LAT, USER_LONG, latitudes, longitudes, RADIUS)
+    return indices
+
+def best_of(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print(f"{'points':>10} {'scalar (ms)':>12} {'vectorized (ms)':>16} {'speedup':>8} {'matches':>8}")
+
+    for size in SIZES:
+        latitudes = USER_LAT + rng.uniform(-0.5, 0.5, size)
+        longitudes = USER_LONG + rng.uniform(-0.5, 0.5, size)
+        lat_list, long_list = latitudes.tolist(), longitudes.tolist()
+
+        scalar_time, scalar_result = best_of(scalar_filter, lat_list, long_list, repeat=1 if size >= 1_000_000 else 3)
+        vector_time, vector_result = best_of(vectorized_filter, latitudes, longitudes)
+        # the two formulas can round differently for points sitting exactly on the radius
+        mismatches = set(scalar_result).symmetric_difference(vector_result.tolist())
+        assert all(abs(haversine(lat_list[i], long_list[i], USER_LAT, USER_LONG) - RADIUS) < 1e-6 for i in mismatches)
+
+        print(f"{size:>10} {scalar_time * 1000:>12.1f} {vector_time * 1000:>16.1f} "
+              f"{scalar_time / vector_time:>7.0f}x {len(vector_result):>8}")
@@ -0,0 +1,78 @@
+"""Deal-feed latency under a concurrent login burst, bcrypt inline vs on the PasswordHasher pool.
+
+Feed requests serialize a 200 restaurant payload in a loop while login threads
+verify passwords, the feed's p50/p99 are compared against an idle baseline.
+
+Run from flask_server/: `python benchmarks/bench_login_load.py`
+"""
+import os
+import sys
+import threading
+import time
+import bcrypt
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import json_stream
+from password_hasher import PasswordHasher, _verify
+
+ROUNDS = 12
+LOGIN_THREADS = 16
+DURATION_SECONDS = 5
+RESTAURANTS = 200
+DEALS_PER_RESTAURANT = 5
+
+def make_feed():
+    return [
+        {
+            "id": i, "place_id": f"place{i}", "restaurant_name": f"Restaurant {i}",
+            "coordinates": {"latitude": 43.47 + i * 1e-4, "longitude": -80.54},
+            "Deal": [
+                {"id": f"{i}-{j}", "item": "Pizza", "description": "Two for one " * 4, "price": 9.99,
+                 "upvotes": j, "downvotes": 0, "start_times": [0] * 7, "end_times": [1440] * 7}
+                for j in range(DEALS_PER_RESTAURANT)
+            ],
+        }
+        for i in range(RESTAURANTS)
+    ]
+
+def run(verify, password, password_hash):
+    """Feed latencies in ms over DURATION_SECONDS, with login threads calling verify if given."""
+    feed = make_feed()
+    stop = threading.Event()
+
+    def login_loop():
+        while not stop.is_set():
+            verify(password, password_hash)
+
+    threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(LOGIN_THREADS if verify else 0)]
+    for thread in threads:
+        thread.start()
+
+    latencies = []
+    deadline = time.perf_counter() + DURATION_SECONDS
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        json_stream.dumps(feed)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)  # requests arrive spaced out, not back to back
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies)
+
+if __name__ == "__main__":
+    password = "correct horse battery staple"
+    password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=ROUNDS)).decode("utf-8")
+    hasher = PasswordHasher(workers=2, max_pending=LOGIN_THREADS, rounds=ROUNDS, timeout_seconds=30)
+
+    print(f"{os.cpu_count()} CPUs, {LOGIN_THREADS} login threads, bcrypt cost {ROUNDS}")
+    print(f"{'mode':>10} {'feed p50 (ms)':>14} {'feed p99 (ms)':>14} {'requests':>9}")
+
+    for mode, verify in [("idle", None), ("inline", _verify), ("pool", hasher.verify)]:
+        latencies = run(verify, password, password_hash)
+        print(f"{mode:>10} {np.percentile(latencies, 50):>14.2f} {np.percentile(latencies, 99):>14.2f} {len(latencies):>9}")
+
+    hasher.shutdown()
@@ -0,0 +1,91 @@
+from collections import namedtuple
+
+# Filters from the query, types and groups are sets of accepted values, any of them None means no filter on it
+DealFilter = namedtuple("DealFilter", ["types", "groups", "min_price", "max_price"])
+
+# Deals for these applicable groups apply to everyone, so they match any group filter.
+# The app maps EVERYONE to ApplicableGroup.ALL and anything unknown to NONE
+UNRESTRICTED_GROUPS = (None, "NONE", "ALL", "EVERYONE")
+
+def _iter_bits(mask):
+    """Yields the positions of the set bits of mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def _any_of(bitsets, values):
+    mask = 0
+    for value in values:
+        mask |= bitsets.get(value, 0)
+    return mask
+
+class _RestaurantDeals:
+    """One restaurant's part of the index, bitsets are over the positions of its own deals."""
+
+    __slots__ = ("deal_ids", "prices", "by_type", "by_group")
+
+    def __init__(self, deals):
+        self.deal_ids = tuple(deal.id for deal in deals)
+        self.prices = tuple(deal.price for deal in deals)
+        self.by_type = {}
+        self.by_group = {}
+        for position, deal in enumerate(deals):
+            bit = 1 << position
+            self.by_type[deal.type] = self.by_type.get(deal.type, 0) | bit
+            self.by_group[deal.applicable_group] = self.by_group.get(deal.applicable_group, 0) | bit
+
+    def match(self, deal_filter):
+        mask = (1 << len(self.deal_ids)) - 1
+        if deal_filter.types:
+            mask &= _any_of(self.by_type, deal_filter.types)
+        if deal_filter.groups:
+            mask &= _any_of(self.by_group, deal_filter.groups) | _any_of(self.by_group, UNRESTRICTED_GROUPS)
+        if not mask:
+            return []
+
+        positions = _iter_bits(mask)
+        min_price, max_price = deal_filter.min_price, deal_filter.max_price
+        if min_price is not None or max_price is not None:
+            # only the deals left after the type and group filters have their price checked
+            positions = (
+                position for position in positions
+                if self.prices[position] is not None
+                and (min_price is None or self.prices[position] >= min_price)
+                and (max_price is None or self.prices[position] <= max_price)
+            )
+        return [self.deal_ids[position] for position in positions]
+
+class DealFilterIndex:
+    """Inverted index over deal type and applicable group, rebuilt with the deal snapshot.
+
+    The index is partitioned by restaurant: each restaurant maps its deals'
+    types and groups to bitsets over its own deals. A query only visits the
+    restaurants the spatial index returned, and the bitsets stay a few bits
+    wide however many deals the city has. Prices are checked exactly on the
+    deals left after the type and group filters.
+    """
+
+    def __init__(self):
+        self._restaurants = {}  # restaurant_id -> _RestaurantDeals, replaced whole on rebuild
+
+    def rebuild(self, restaurants):
+        """Indexes the deals of the given RestaurantRecords."""
+        self._restaurants = {restaurant.id: _RestaurantDeals(restaurant.deals) for restaurant in restaurants}
+
+    def matching_deals(self, restaurant_ids, deal_filter):
+        """Returns {restaurant_id: [deal ids matching the filter]}, in the order of restaurant_ids.
+
+        Restaurants without a matching deal are left out. Deals without a price never match a price filter.
+        """
+        indexed = self._restaurants
+        matches = {}
+        for restaurant_id in restaurant_ids:
+            restaurant = indexed.get(restaurant_id)
+            if restaurant is None:
+                continue
+
+            deal_ids = restaurant.match(deal_filter)
+            if deal_ids:
+                matches[restaurant_id] = deal_ids
+        return matches
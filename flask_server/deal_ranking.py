@@ -0,0 +1,113 @@
+import heapq
+import math
+import threading
+from sweeper import BAD_KARMA_THRESHOLD
+
+# Scores are in "orders of magnitude of net votes", like Reddit's hot ranking:
+# a deal posted RECENCY_DAYS later ranks the same as one with 10x the net
+# votes. Deals run for weeks, so a week keeps a well voted deal ahead of a
+# new one for a while instead of burying it within a day.
+RECENCY_DAYS = 7
+
+# Bounded terms, so votes still decide between deals of the same age: being at
+# the center instead of the edge of the radius is worth at most 10x the net
+# votes, ending now instead of URGENCY_WINDOW_HOURS from now at most ~3x.
+# Deals ending later, or not at all, get no urgency boost.
+DISTANCE_WEIGHT = 1.0
+URGENCY_WEIGHT = 0.5
+URGENCY_WINDOW_HOURS = 48
+
+VOTE_VALUES = {"UPVOTE": 1, "DOWNVOTE": -1}
+
+_RECENCY_MS = RECENCY_DAYS * 24 * 60 * 60 * 1000
+_URGENCY_WINDOW_MS = URGENCY_WINDOW_HOURS * 60 * 60 * 1000
+
+def base_score(net_votes, posted_ms):
+    """The part of a deal's score that doesn't depend on distance or the current time.
+
+    Recency is linear in date_posted, so the current time would shift every
+    deal's score by the same amount and is left out. That lets the score be
+    computed once per vote or insert instead of on every request.
+    """
+    votes = math.copysign(math.log10(1 + abs(net_votes)), net_votes)
+    return votes + (posted_ms or 0) / _RECENCY_MS
+
+def urgency_bonus(expiry_ms, now_ms):
+    """Boost for deals ending within URGENCY_WINDOW_HOURS, growing to URGENCY_WEIGHT as they run out."""
+    if expiry_ms is None:
+        return 0.0
+
+    remaining_ms = expiry_ms - now_ms
+    if remaining_ms >= _URGENCY_WINDOW_MS:
+        return 0.0
+    return URGENCY_WEIGHT * (1 - remaining_ms / _URGENCY_WINDOW_MS)
+
+class DealRanker:
+    """Precomputed base scores of every deal, for the "best deals near me" feed.
+
+    Rebuilt with the deal snapshot, and kept current in between by votes,
+    inserts and removals made through this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deals = {}  # deal_id -> (restaurant_id, base score, net votes, posted_ms, expiry_ms)
+        self._by_restaurant = {}  # restaurant_id -> set of deal ids
+
+    def rebuild(self, restaurants):
+        """Scores the deals of the given RestaurantRecords."""
+        deals = {}
+        by_restaurant = {}
+        for restaurant in restaurants:
+            by_restaurant[restaurant.id] = {deal.id for deal in restaurant.deals}
+            for deal in restaurant.deals:
+                net_votes = deal.num_upvote - deal.num_downvote
+                deals[deal.id] = (restaurant.id, base_score(net_votes, deal.posted_ms), net_votes, deal.posted_ms, deal.expiry_ms)
+
+        with self._lock:
+            self._deals = deals
+            self._by_restaurant = by_restaurant
+
+    def add(self, deal_id, restaurant_id, posted_ms, expiry_ms, net_votes=0):
+        with self._lock:
+            self._deals[deal_id] = (restaurant_id, base_score(net_votes, posted_ms), net_votes, posted_ms, expiry_ms)
+            self._by_restaurant.setdefault(restaurant_id, set()).add(deal_id)
+
+    def remove(self, deal_id):
+        with self._lock:
+            entry = self._deals.pop(deal_id, None)
+            if entry:
+                self._by_restaurant.get(entry[0], set()).discard(deal_id)
+
+    def record_vote(self, deal_id, previous_vote, new_vote):
+        """Moves a user's vote from previous_vote to new_vote and rescores the deal."""
+        delta = VOTE_VALUES.get(new_vote, 0) - VOTE_VALUES.get(previous_vote, 0)
+        if not delta:
+            return
+
+        with self._lock:
+            entry = self._deals.get(deal_id)
+            if entry:
+                restaurant_id, _, net_votes, posted_ms, expiry_ms = entry
+                net_votes += delta
+                self._deals[deal_id] = (restaurant_id, base_score(net_votes, posted_ms), net_votes, posted_ms, expiry_ms)
+
+    def top(self, nearby, radius, k, now_ms):
+        """The k best deals among the nearby restaurants, as [(score, deal_id, restaurant_id)] best first.
+
+        nearby is [(restaurant_id, distance)] within radius. The urgency
+        boost is only computed here, for deals inside its window. Expired and
+        bad karma deals are skipped, and only the k best are kept in a heap
+        instead of sorting every candidate.
+        """
+        with self._lock:
+            def candidates():
+                for restaurant_id, distance in nearby:
+                    penalty = DISTANCE_WEIGHT * min(distance / radius, 1) if radius > 0 else 0
+                    for deal_id in self._by_restaurant.get(restaurant_id, ()):
+                        _, base, net_votes, _, expiry_ms = self._deals[deal_id]
+                        if (expiry_ms is not None and expiry_ms < now_ms) or -net_votes >= BAD_KARMA_THRESHOLD:
+                            continue
+                        yield base - penalty + urgency_bonus(expiry_ms, now_ms), deal_id, restaurant_id
+
+            return heapq.nlargest(k, candidates(), key=lambda candidate: candidate[0])
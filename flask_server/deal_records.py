@@ -0,0 +1,199 @@
+import logging
+from datetime import datetime
+import pytz
+from sweeper import BAD_KARMA_THRESHOLD
+
+logger = logging.getLogger('werkzeug')
+
+# Compact resident form of the deal snapshot. Rows are parsed once when the
+# snapshot loads, timestamps included, and response dicts are only built when
+# a request serializes them.
+
+# Weekly availability is a bitmap of 15 minute slots, bit 0 is Monday 00:00-00:14
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+ALWAYS_AVAILABLE = (1 << (7 * SLOTS_PER_DAY)) - 1
+
+def parse_iso_ms(iso_string):
+    """Converts an ISO 8601 string to epoch milliseconds, None if it is missing or malformed."""
+    if not iso_string:
+        return None
+
+    try:
+        dt = datetime.fromisoformat(iso_string.replace('Z', '+00:00'))
+        return int(dt.astimezone(pytz.UTC).timestamp() * 1000)
+    except ValueError as e:
+        logger.error(f"Error parsing ISO string: {str(e)}", exc_info=True)
+        return None
+
+def _is_minute_of_day(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 24 * 60
+
+def availability_mask(start_times, end_times):
+    """Compiles the deal's daily (start, end) minutes, Monday first, into a weekly slot bitmap.
+
+    Like in the app both ends are inclusive, (0, 0) is a day without the deal
+    and missing or malformed times mean no restriction. A slot is set if the
+    deal is available for any minute of it.
+    """
+    if start_times is None or end_times is None or len(start_times) != 7 or len(end_times) != 7:
+        return ALWAYS_AVAILABLE
+
+    mask = 0
+    for day, (start, end) in enumerate(zip(start_times, end_times)):
+        if not _is_minute_of_day(start) or not _is_minute_of_day(end) or end < start:
+            # one bad row shouldn't fail the whole snapshot load, the deal is shown as always available
+            logger.warning(f"Malformed daily times {start_times} to {end_times}, treating the deal as always available")
+            return ALWAYS_AVAILABLE
+        if end <= 0:
+            continue
+
+        first = start // SLOT_MINUTES
+        last = min(end // SLOT_MINUTES, SLOTS_PER_DAY - 1)
+        mask |= ((1 << (last - first + 1)) - 1) << (day * SLOTS_PER_DAY + first)
+
+    return mask
+
+def availability_bit(epoch_ms, tz):
+    """The bitmap bit for the slot containing epoch_ms, in the deals' time zone."""
+    dt = datetime.fromtimestamp(epoch_ms / 1000, tz=tz)
+    return 1 << (dt.weekday() * SLOTS_PER_DAY + (dt.hour * 60 + dt.minute) // SLOT_MINUTES)
+
+class DealRecord:
+    """One deal of the snapshot, with its timestamps already in epoch ms."""
+
+    __slots__ = (
+        "id", "restaurant_id", "item", "description", "type", "expiry_ms", "posted_ms",
+        "user_id", "username", "price", "image_id", "applicable_group",
+        "start_times", "end_times", "availability", "num_upvote", "num_downvote",
+    )
+
+    def __init__(self, id, restaurant_id, item, description, type, expiry_ms, posted_ms,
+                 user_id, username, price, image_id, applicable_group,
+                 start_times, end_times, num_upvote, num_downvote):
+        self.id = id
+        self.restaurant_id = restaurant_id
+        self.item = item
+        self.description = description
+        self.type = type
+        self.expiry_ms = expiry_ms
+        self.posted_ms = posted_ms
+        self.user_id = user_id
+        self.username = username
+        self.price = price
+        self.image_id = image_id
+        self.applicable_group = applicable_group
+        self.start_times = start_times
+        self.end_times = end_times
+        self.availability = availability_mask(start_times, end_times)
+        self.num_upvote = num_upvote
+        self.num_downvote = num_downvote
+
+    @classmethod
+    def from_rpc_row(cls, row):
+        """Builds the record from a `get_all_restaurant_deals` row."""
+        return cls(
+            row["id"], row["restaurant_id"], row["item"], row["description"], row["type"],
+            parse_iso_ms(row["expiry_date"]), parse_iso_ms(row["date_posted"]),
+            row["user_id"], row["username"], row["price"], row["image_id"], row["applicable_group"],
+            tuple(row["start_times"]) if isinstance(row["start_times"], list) else None,
+            tuple(row["end_times"]) if isinstance(row["end_times"], list) else None,
+            row["upvotes"], row["downvotes"],
+        )
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, DealRecord) and self._values() == other._values()
+
+    __hash__ = None  # mutable, vote totals change in place
+
+    def has_bad_karma(self):
+        return self.num_downvote - self.num_upvote >= BAD_KARMA_THRESHOLD
+
+    def is_available(self, slot_bit):
+        return bool(self.availability & slot_bit)
+
+    def is_live(self, now_ms):
+        """False once the deal has expired or been downvoted enough, the sweeper removes those in Supabase."""
+        if self.expiry_ms is not None and self.expiry_ms < now_ms:
+            return False
+        return not self.has_bad_karma()
+
+    def to_dict(self, user_saved=False, user_vote=None):
+        """The deal as the Android app expects it."""
+        return {
+            "id": self.id,
+            "item": self.item,
+            "description": self.description,
+            "type": self.type,
+            "expiry_date": self.expiry_ms,
+            "date_posted": self.posted_ms,
+            "user_id": self.user_id,
+            "username": self.username,
+            "price": self.price,
+            "image_id": self.image_id,
+            "user_saved": user_saved,
+            "user_vote": user_vote,
+            "applicable_group": self.applicable_group,
+            "daily_start_times": self.start_times,
+            "daily_end_times": self.end_times,
+            "num_upvote": self.num_upvote,
+            "num_downvote": self.num_downvote,
+        }
+
+class RestaurantRecord:
+    """One restaurant of the snapshot and its DealRecords.
+
+    availability is the union of its deals' bitmaps, so restaurants can be
+    ruled out without looking at each deal.
+    """
+
+    __slots__ = ("id", "place_id", "latitude", "longitude", "restaurant_name", "display_address", "image_url", "deals", "availability")
+
+    def __init__(self, id, place_id, latitude, longitude, restaurant_name, display_address, image_url, deals=None):
+        self.id = id
+        self.place_id = place_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.restaurant_name = restaurant_name
+        self.display_address = display_address
+        self.image_url = image_url
+        self.deals = deals if deals is not None else []
+        self.availability = 0
+        for deal in self.deals:
+            self.availability |= deal.availability
+
+    def to_dict(self, deals):
+        """The restaurant as the Android app expects it, with the given deal dicts."""
+        return {
+            "id": self.id,
+            "place_id": self.place_id,
+            "coordinates": {
+                "latitude": self.latitude,
+                "longitude": self.longitude
+            },
+            "restaurant_name": self.restaurant_name,
+            "display_address": self.display_address,
+            "image_url": self.image_url,
+            "Deal": deals,
+        }
+
+def build_restaurant_records(rows):
+    """Groups `get_all_restaurant_deals` rows, one per deal, into RestaurantRecords."""
+    restaurants = {}
+
+    for row in rows:
+        restaurant = restaurants.get(row["restaurant_id"])
+        if restaurant is None:
+            restaurant = restaurants[row["restaurant_id"]] = RestaurantRecord(
+                row["restaurant_id"], row["place_id"], row["latitude"], row["longitude"],
+                row["restaurant_name"], row["display_address"], row["image_url"],
+            )
+
+        deal = DealRecord.from_rpc_row(row)
+        restaurant.deals.append(deal)
+        restaurant.availability |= deal.availability
+
+    return list(restaurants.values())
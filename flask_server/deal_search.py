@@ -0,0 +1,193 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+# Words that would match most deals and say nothing about them
+STOPWORDS = {"a", "an", "and", "the", "of", "for", "with", "on", "in", "at", "to", "or"}
+
+# A match in the item counts more than one in the description
+ITEM_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# A query word also matches indexed words whose trigrams overlap this much, e.g. "pizz" or "piza" for "pizza"
+MIN_TRIGRAM_SIMILARITY = 0.4
+MAX_EXPANSIONS = 8
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    """Lowercase words of the text, without stopwords."""
+    if not text:
+        return []
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def trigrams(token):
+    """Trigrams of the token padded with $, so the start and end of words count."""
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class DealSearchIndex:
+    """In-memory inverted index over deal item and description text.
+
+    Postings are grouped by restaurant, token -> {restaurant_id: {deal_id: weight}},
+    so a search near the user only visits the restaurants in the radius. The
+    indexed words are themselves indexed by trigram, which lets a query word
+    match prefixes and small typos. Deals are added and removed one at a time,
+    `sync` brings the index in line with a fresh snapshot by touching only the
+    deals that changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # token -> {restaurant_id: {deal_id: weight}}
+        self._document_frequency = Counter()  # token -> number of deals with it
+        self._trigrams = {}  # trigram -> set of tokens
+        self._documents = {}  # deal_id -> (restaurant_id, item, description, tokens)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add(self, deal_id, restaurant_id, item, description):
+        weights = Counter()
+        for token in tokenize(item):
+            weights[token] += ITEM_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                for trigram in trigrams(token):
+                    self._trigrams.setdefault(trigram, set()).add(token)
+            postings.setdefault(restaurant_id, {})[deal_id] = weight
+            self._document_frequency[token] += 1
+
+        self._documents[deal_id] = (restaurant_id, item, description, tuple(weights))
+
+    def _remove(self, deal_id):
+        document = self._documents.pop(deal_id, None)
+        if document is None:
+            return
+
+        restaurant_id, _, _, tokens = document
+        for token in tokens:
+            postings = self._postings[token]
+            deals = postings[restaurant_id]
+            del deals[deal_id]
+            if not deals:
+                del postings[restaurant_id]
+
+            self._document_frequency[token] -= 1
+            if not self._document_frequency[token]:
+                # the word is gone from every deal, so it can't be suggested for queries anymore
+                del self._document_frequency[token]
+                del self._postings[token]
+                for trigram in trigrams(token):
+                    words = self._trigrams[trigram]
+                    words.discard(token)
+                    if not words:
+                        del self._trigrams[trigram]
+
+    def add(self, deal_id, restaurant_id, item, description):
+        """Indexes a deal, replacing what was indexed for it before."""
+        with self._lock:
+            self._remove(deal_id)
+            self._add(deal_id, restaurant_id, item, description)
+
+    def remove(self, deal_id):
+        with self._lock:
+            self._remove(deal_id)
+
+    def sync(self, restaurants):
+        """Updates the index to the deals of the given RestaurantRecords, returns (added, removed)."""
+        with self._lock:
+            seen = set()
+            added = 0
+            for restaurant in restaurants:
+                for deal in restaurant.deals:
+                    seen.add(deal.id)
+                    document = self._documents.get(deal.id)
+                    if document and document[:3] == (restaurant.id, deal.item, deal.description):
+                        continue
+
+                    self._remove(deal.id)
+                    self._add(deal.id, restaurant.id, deal.item, deal.description)
+                    added += 1
+
+            gone = self._documents.keys() - seen
+            for deal_id in gone:
+                self._remove(deal_id)
+
+        return added, len(gone)
+
+    def _expand(self, query_token):
+        """Indexed words matching the query word, as (token, similarity), the word itself first."""
+        matches = [(query_token, 1.0)] if query_token in self._postings else []
+        if len(query_token) < 3:
+            return matches
+
+        query_trigrams = trigrams(query_token)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+        shared.pop(query_token, None)
+
+        similar = []
+        for token, count in shared.items():
+            similarity = count / (len(query_trigrams) + len(trigrams(token)) - count)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                similar.append((similarity, token))
+
+        matches.extend((token, similarity) for similarity, token in heapq.nlargest(MAX_EXPANSIONS, similar))
+        return matches
+
+    def search(self, query, restaurants=None, limit=None):
+        """Scores the deals matching the query, returns [(score, deal_id, restaurant_id)] best first.
+
+        Each query word adds the best similarity * idf * weight among the words
+        it matches in the deal, so deals matching more of the query rank
+        higher. With restaurants, a dict of restaurant_id -> factor, only the
+        deals of those restaurants are considered and their scores are
+        multiplied by the factor, e.g. to favour closer restaurants.
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            total = len(self._documents)
+            scores = {}  # deal_id -> (score, restaurant_id)
+            for query_token in query_tokens:
+                best = {}  # deal_id -> (contribution, restaurant_id) of this query word
+                for token, similarity in self._expand(query_token):
+                    idf = math.log(1 + total / self._document_frequency[token])
+                    postings = self._postings[token]
+
+                    # walk whichever side is smaller, the nearby restaurants or the word's postings
+                    if restaurants is None:
+                        groups = postings.items()
+                    elif len(restaurants) < len(postings):
+                        groups = ((restaurant_id, postings[restaurant_id]) for restaurant_id in restaurants if restaurant_id in postings)
+                    else:
+                        groups = ((restaurant_id, deals) for restaurant_id, deals in postings.items() if restaurant_id in restaurants)
+
+                    for restaurant_id, deals in groups:
+                        for deal_id, weight in deals.items():
+                            contribution = similarity * idf * weight
+                            if contribution > best.get(deal_id, (0,))[0]:
+                                best[deal_id] = (contribution, restaurant_id)
+
+                for deal_id, (contribution, restaurant_id) in best.items():
+                    score = scores.get(deal_id, (0,))[0]
+                    scores[deal_id] = (score + contribution, restaurant_id)
+
+        if restaurants is None:
+            results = ((score, deal_id, restaurant_id) for deal_id, (score, restaurant_id) in scores.items())
+        else:
+            results = ((score * restaurants[restaurant_id], deal_id, restaurant_id) for deal_id, (score, restaurant_id) in scores.items())
+        if limit is None:
+            return sorted(results, key=lambda result: result[0], reverse=True)
+        return heapq.nlargest(limit, results, key=lambda result: result[0])
@@ -0,0 +1,309 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger('werkzeug')
+
+VOTE_FIELDS = {"UPVOTE": "num_upvote", "DOWNVOTE": "num_downvote"}
+
+# How long removals are remembered for delta sync, older cursors get a full response
+TOMBSTONE_RETENTION_SECONDS = 24 * 60 * 60
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+class DealSnapshot:
+    """Process-level copy of the user-independent restaurant and deal data.
+
+    One `get_all_restaurant_deals` RPC fills it, after which every request is
+    served from memory until the TTL runs out or a local write invalidates it.
+    It holds compact RestaurantRecords and DealRecords, response dicts are
+    only built by `materialize`.
+
+    It also keeps a change log of when each deal was last added, edited, voted
+    on or removed, as seen by this process, so clients can sync deltas.
+    """
+
+    def __init__(self, loader, ttl_seconds, on_refresh=None, on_remove=None):
+        self._loader = loader
+        self._on_refresh = on_refresh
+        self._on_remove = on_remove
+        self.ttl_seconds = ttl_seconds
+        self._restaurants = {}  # restaurant_id -> RestaurantRecord
+        self._deals = {}  # deal_id -> (restaurant_id, DealRecord)
+        self._changed_at = {}  # deal_id -> epoch ms of the last add, edit or vote
+        self._removed_at = {}  # deal_id -> epoch ms the deal disappeared
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stale = True
+        self.loaded_at = None
+        self.version = 0
+        self.tracking_since = None  # epoch ms from which the change log is complete
+        self.as_of_ms = None  # epoch ms the RPC behind the current snapshot was started, the sync cursor
+
+    def _needs_refresh(self):
+        return self._stale or self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl_seconds
+
+    def refresh(self):
+        """Reloads the snapshot from Supabase, the loader returns RestaurantRecords.
+
+        Changes found by comparing with the previous snapshot are logged at the
+        time the RPC started. Whatever the RPC returned was in Supabase by then,
+        so a client whose cursor is older than that gets the change on its next
+        sync from any worker.
+        """
+        started = _now_ms()
+        restaurants = self._loader()
+
+        restaurant_map = {}
+        deal_map = {}
+        for restaurant in restaurants:
+            restaurant_map[restaurant.id] = restaurant
+            for deal in restaurant.deals:
+                deal_map[deal.id] = (restaurant.id, deal)
+
+        with self._lock:
+            if self.tracking_since is None:
+                self.tracking_since = started
+            else:
+                # anything that differs from the previous snapshot changed somewhere else,
+                # deals flagged is_removed are no longer returned by the RPC
+                for deal_id, (_, deal) in deal_map.items():
+                    previous = self._deals.get(deal_id)
+                    if previous is None or previous[1] != deal:
+                        self._changed_at[deal_id] = started
+                        self._removed_at.pop(deal_id, None)
+
+                for deal_id in self._deals.keys() - deal_map.keys():
+                    self._removed_at[deal_id] = started
+                    self._changed_at.pop(deal_id, None)
+
+            self._prune_change_log(_now_ms())
+            self._restaurants = restaurant_map
+            self._deals = deal_map
+            self._stale = False
+            self.loaded_at = time.monotonic()
+            self.as_of_ms = started
+            self.version += 1
+
+        logger.info(f"Refreshed deal snapshot with {len(restaurant_map)} restaurants and {len(deal_map)} deals")
+
+        if self._on_refresh:
+            self._on_refresh(self)
+
+    def ensure_fresh(self):
+        """Refreshes the snapshot if it is stale.
+
+        Only one thread reloads at a time, the others keep serving the previous
+        snapshot unless there is nothing loaded yet.
+        """
+        if not self._needs_refresh():
+            return self
+
+        blocking = self.loaded_at is None
+        if self._refresh_lock.acquire(blocking=blocking):
+            try:
+                if self._needs_refresh():
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh deal snapshot: {str(e)}", exc_info=True)
+            finally:
+                self._refresh_lock.release()
+
+        return self
+
+    def invalidate(self):
+        """Marks the snapshot stale so the next read reloads it."""
+        self._stale = True
+
+    def restaurant_records(self):
+        """Returns every RestaurantRecord in the snapshot."""
+        return list(self._restaurants.values())
+
+    def restaurant_locations(self):
+        """Returns (id, latitude, longitude) for every restaurant in the snapshot."""
+        return [
+            (restaurant_id, restaurant.latitude, restaurant.longitude)
+            for restaurant_id, restaurant in self._restaurants.items()
+        ]
+
+    def apply_vote(self, deal_id, previous_vote, new_vote):
+        """Moves a user's vote on the deal's totals from previous_vote to new_vote."""
+        with self._lock:
+            entry = self._deals.get(deal_id)
+            if not entry or previous_vote == new_vote:
+                return
+
+            deal = entry[1]
+            if previous_vote in VOTE_FIELDS:
+                field = VOTE_FIELDS[previous_vote]
+                setattr(deal, field, getattr(deal, field) - 1)
+            if new_vote in VOTE_FIELDS:
+                field = VOTE_FIELDS[new_vote]
+                setattr(deal, field, getattr(deal, field) + 1)
+            self._changed_at[deal_id] = _now_ms()
+            self.version += 1
+
+    def remove_deal(self, deal_id):
+        """Drops a deal from the snapshot."""
+        with self._lock:
+            entry = self._deals.pop(deal_id, None)
+            if not entry:
+                return
+
+            restaurant = self._restaurants.get(entry[0])
+            if restaurant:
+                restaurant.deals = [deal for deal in restaurant.deals if deal.id != deal_id]
+            self._changed_at.pop(deal_id, None)
+            self._removed_at[deal_id] = _now_ms()
+            self.version += 1
+
+        if self._on_remove:
+            self._on_remove(deal_id)
+
+    def _prune_change_log(self, now):
+        cutoff = now - TOMBSTONE_RETENTION_SECONDS * 1000
+        if self.tracking_since >= cutoff:
+            return
+
+        self._removed_at = {deal_id: at for deal_id, at in self._removed_at.items() if at >= cutoff}
+        self._changed_at = {deal_id: at for deal_id, at in self._changed_at.items() if at >= cutoff}
+        self.tracking_since = cutoff
+
+    def changes_since(self, since):
+        """Returns (changed deal ids, removed deal ids) after the `since` epoch ms.
+
+        Returns None if the change log doesn't reach back that far, in which
+        case the caller has to send everything.
+        """
+        with self._lock:
+            if self.tracking_since is None or since < self.tracking_since:
+                return None
+
+            changed = {deal_id for deal_id, at in self._changed_at.items() if at >= since}
+            removed = [deal_id for deal_id, at in self._removed_at.items() if at >= since]
+
+        return changed, removed
+
+    def materialize(self, restaurant_ids, overlay=None, deal_ids=None, slot_bit=None):
+        """Builds response-ready dicts of the given restaurants with the user's overlay merged in.
+
+        Expired and bad karma deals are left out. If `deal_ids` is given only
+        those deals are kept, if `slot_bit` is given only the deals available
+        in that slot (see deal_records.availability_bit). With either filter,
+        restaurants left with no deals are dropped.
+        """
+        return list(self.iter_materialized(restaurant_ids, overlay, deal_ids, slot_bit))
+
+    def iter_materialized(self, restaurant_ids, overlay=None, deal_ids=None, slot_bit=None):
+        """Lazy version of `materialize` that builds one restaurant at a time, for streaming."""
+        now_ms = _now_ms()
+        filtered = deal_ids is not None or slot_bit is not None
+        for restaurant_id in restaurant_ids:
+            with self._lock:
+                restaurant = self._restaurants.get(restaurant_id)
+                if not restaurant:
+                    continue
+                if slot_bit is not None and not restaurant.availability & slot_bit:
+                    continue
+
+                deals = []
+                for deal in restaurant.deals:
+                    if deal_ids is not None and deal.id not in deal_ids:
+                        continue
+                    if slot_bit is not None and not deal.is_available(slot_bit):
+                        continue
+                    if not deal.is_live(now_ms):
+                        continue
+                    if overlay:
+                        deals.append(deal.to_dict(deal.id in overlay.saved, overlay.votes.get(deal.id)))
+                    else:
+                        deals.append(deal.to_dict())
+
+            if filtered and not deals:
+                continue
+
+            yield restaurant.to_dict(deals)
+
+    def available_restaurant_ids(self, restaurant_ids, slot_bit):
+        """Keeps the restaurants that have any deal available in the slot."""
+        with self._lock:
+            return [
+                restaurant_id for restaurant_id in restaurant_ids
+                if restaurant_id in self._restaurants and self._restaurants[restaurant_id].availability & slot_bit
+            ]
+
+    def find_deal_ids(self, predicate):
+        """Returns the ids of the deals for which predicate(deal_record) is True."""
+        with self._lock:
+            return [deal_id for deal_id, (_, deal) in self._deals.items() if predicate(deal)]
+
+    def restaurant_ids_for_deals(self, deal_ids):
+        """Returns the ids of the restaurants owning any of the given deals."""
+        with self._lock:
+            return list(dict.fromkeys(
+                self._deals[deal_id][0] for deal_id in deal_ids if deal_id in self._deals
+            ))
+
+
+class UserOverlay:
+    """The per-user part of the deals feed: which deals the user saved and how they voted."""
+
+    def __init__(self, saved, votes):
+        self.saved = saved  # set of deal ids
+        self.votes = votes  # deal_id -> "UPVOTE" | "DOWNVOTE"
+        self.loaded_at = time.monotonic()
+
+
+class UserOverlayCache:
+    """Small LRU of UserOverlays, kept current by local writes and reloaded on a TTL."""
+
+    def __init__(self, loader, ttl_seconds, max_users=10000):
+        self._loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._overlays = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Returns the user's overlay, loading it from Supabase on a miss."""
+        if not user_id:
+            return None
+
+        with self._lock:
+            overlay = self._overlays.get(user_id)
+            if overlay and time.monotonic() - overlay.loaded_at <= self.ttl_seconds:
+                self._overlays.move_to_end(user_id)
+                return overlay
+
+        saved, votes = self._loader(user_id)
+        overlay = UserOverlay(saved, votes)
+
+        with self._lock:
+            self._overlays[user_id] = overlay
+            self._overlays.move_to_end(user_id)
+            while len(self._overlays) > self.max_users:
+                self._overlays.popitem(last=False)
+
+        return overlay
+
+    def set_saved(self, user_id, deal_id, saved):
+        """Records a save or unsave made through this process."""
+        with self._lock:
+            overlay = self._overlays.get(user_id)
+            if overlay:
+                if saved:
+                    overlay.saved.add(deal_id)
+                else:
+                    overlay.saved.discard(deal_id)
+
+    def set_vote(self, user_id, deal_id, vote_type):
+        """Records a vote made through this process, NEUTRAL clears it."""
+        with self._lock:
+            overlay = self._overlays.get(user_id)
+            if overlay:
+                if vote_type in VOTE_FIELDS:
+                    overlay.votes[deal_id] = vote_type
+                else:
+                    overlay.votes.pop(deal_id, None)
@@ -0,0 +1,82 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Radius of the Earth in meters
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters between two points, for one-off checks."""
+    R = EARTH_RADIUS_M
+
+    # Convert latitude and longitude from degrees to radians
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+
+    # Differences in coordinates
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    # Haversine formula
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    # Distance in meters
+    distance = R * c
+    return distance
+
+def bounding_box(latitude, longitude, radius):
+    """Returns (min_lat, max_lat, min_long, max_long) enclosing a circle of `radius` meters.
+
+    The longitudes are not wrapped, the box may reach past ±180 when the circle
+    crosses the antimeridian, see `longitude_ranges`. A circle reaching a pole,
+    or half the globe, gets every longitude.
+    """
+    angular_radius = radius / EARTH_RADIUS_M
+    lat_span = math.degrees(angular_radius)
+    min_lat, max_lat = latitude - lat_span, latitude + lat_span
+    if angular_radius >= math.pi / 2 or min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    # the circle's widest longitude extent on a sphere
+    ratio = math.sin(angular_radius) / math.cos(math.radians(latitude))
+    long_span = math.degrees(math.asin(ratio)) if ratio < 1 else 180.0
+
+    return min_lat, max_lat, longitude - long_span, longitude + long_span
+
+def longitude_ranges(min_long, max_long):
+    """Splits a bounding box's longitude range into [(min_long, max_long)] within -180..180."""
+    if max_long - min_long >= 360:
+        return [(-180.0, 180.0)]
+    if min_long < -180:
+        return [(min_long + 360, 180.0), (-180.0, max_long)]
+    if max_long > 180:
+        return [(min_long, 180.0), (-180.0, max_long - 360)]
+    return [(min_long, max_long)]
+
+def haversine_many(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in meters from one point to arrays of points, in one vectorized pass."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(longitudes, dtype=np.float64)) - math.radians(longitude)
+
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def within_radius(latitude, longitude, latitudes, longitudes, radius):
+    """Returns (indices, distances) of the points within `radius` meters of (latitude, longitude).
+
+    Points outside the lat/long bounding box are rejected with plain comparisons
+    before any trig is done, only the survivors get an exact haversine distance.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    min_lat, max_lat, min_long, max_long = bounding_box(latitude, longitude, radius)
+
+    in_long = np.zeros(len(longitudes), dtype=bool)
+    for low, high in longitude_ranges(min_long, max_long):
+        in_long |= (longitudes >= low) & (longitudes <= high)
+
+    in_box = np.flatnonzero((latitudes >= min_lat) & (latitudes <= max_lat) & in_long)
+    distances = haversine_many(latitude, longitude, latitudes[in_box], longitudes[in_box])
+
+    in_radius = distances <= radius
+    return in_box[in_radius], distances[in_radius]
@@ -0,0 +1,158 @@
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+logger = logging.getLogger('werkzeug')
+
+# A place whose backfill keeps failing is dropped after this many batches so it can't block the queue
+MAX_ENRICHMENT_ATTEMPTS = 5
+
+# A claimed place is handed out again if its worker hasn't finished it by then, e.g. after a crash
+CLAIM_LEASE_SECONDS = 300
+
+class EnrichmentQueue:
+    """Durable queue of restaurants whose logo still has to be looked up, one entry per place_id.
+
+    Entries live in a SQLite file so they survive restarts and are shared by
+    every worker on the host. A background thread claims up to batch_size
+    places at a time, runs `lookup(place_id)` for them on a thread pool and
+    hands the found URLs to `writer({place_id: image_url})` in one call.
+    `lookup` returns None for a place without a logo and raises when it
+    couldn't tell, those places are retried in a later batch.
+    """
+
+    def __init__(self, path, lookup, writer, interval_seconds=5.0, batch_size=50, workers=4):
+        self._lookup = lookup
+        self._writer = writer
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrichment")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # shared by every thread in the worker, access is serialized by _lock
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pending_enrichment ("
+                "place_id TEXT PRIMARY KEY, enqueued_at REAL NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, claimed_until REAL NOT NULL DEFAULT 0)"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pending_enrichment").fetchone()[0]
+
+    def enqueue(self, place_id):
+        """Queues the place for enrichment, a place that is already queued is left as is."""
+        with self._lock:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO pending_enrichment (place_id, enqueued_at) VALUES (?, ?)",
+                (place_id, time.time()),
+            ).rowcount
+
+        # picked up by the next batch, not right away, so posts arriving together share one write
+        metrics.increment("enrichment.enqueued" if inserted else "enrichment.deduplicated")
+
+    def _claim(self):
+        """Leases the oldest unclaimed places to this worker."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                place_ids = [row[0] for row in self._db.execute(
+                    "SELECT place_id FROM pending_enrichment WHERE claimed_until < ? ORDER BY enqueued_at LIMIT ?",
+                    (now, self.batch_size),
+                )]
+                self._db.executemany(
+                    "UPDATE pending_enrichment SET claimed_until = ? WHERE place_id = ?",
+                    [(now + CLAIM_LEASE_SECONDS, place_id) for place_id in place_ids],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        return place_ids
+
+    def _finish(self, place_ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM pending_enrichment WHERE place_id = ?", [(place_id,) for place_id in place_ids])
+
+    def _release(self, place_ids):
+        """Puts failed places back in the queue, or drops them once they are out of attempts."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE pending_enrichment SET attempts = attempts + 1, claimed_until = 0 WHERE place_id = ?",
+                [(place_id,) for place_id in place_ids],
+            )
+            dropped = self._db.execute(
+                "DELETE FROM pending_enrichment WHERE attempts >= ?", (MAX_ENRICHMENT_ATTEMPTS,)
+            ).rowcount
+
+        if dropped:
+            metrics.increment("enrichment.dropped", dropped)
+            logger.error(f"Dropped {dropped} places from the enrichment queue after {MAX_ENRICHMENT_ATTEMPTS} attempts")
+
+    def _try_lookup(self, place_id):
+        """Returns (True, image_url), or (False, None) if the lookup raised."""
+        try:
+            return True, self._lookup(place_id)
+        except Exception as e:
+            logger.warning(f"Logo lookup for place_id {place_id} failed, it will be retried: {str(e)}")
+            return False, None
+
+    def process_batch(self):
+        """Enriches one batch of queued places, returns how many were claimed."""
+        place_ids = self._claim()
+        if not place_ids:
+            return 0
+
+        with metrics.timed("enrichment.batch"):
+            lookups = dict(zip(place_ids, self._pool.map(self._try_lookup, place_ids)))
+            failed = [place_id for place_id, (ok, _) in lookups.items() if not ok]
+            looked_up = [place_id for place_id, (ok, _) in lookups.items() if ok]
+            found = {place_id: image_url for place_id, (ok, image_url) in lookups.items() if ok and image_url}
+
+            if failed:
+                metrics.increment("enrichment.lookup_errors", len(failed))
+                self._release(failed)
+
+            try:
+                if found:
+                    self._writer(found)
+            except Exception as e:
+                metrics.increment("enrichment.errors")
+                logger.error(f"Failed to backfill {len(found)} restaurant images: {str(e)}", exc_info=True)
+                self._release(looked_up)
+                return len(place_ids)
+
+        # places without a logo are done too, their image_url just stays null
+        self._finish(looked_up)
+        metrics.increment("enrichment.backfilled", len(found))
+        return len(place_ids)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # keep going while full batches come back, then wait for more work
+                if self.process_batch() >= self.batch_size:
+                    continue
+            except Exception as e:
+                metrics.increment("enrichment.errors")
+                logger.error(f"Restaurant enrichment failed: {str(e)}", exc_info=True)
+
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Starts processing the queue on a daemon thread, including anything left from before a restart."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="restaurant-enrichment", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -1,6 +1,14 @@
 import requests
 import os
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import distance
+import http_client
+import metrics
+from single_flight import SingleFlight
+from ttl_cache import MISSING, TTLCache
 
 logger = logging.getLogger('werkzeug')
 
@@ -8,6 +16,31 @@ MAPS_API_KEY = os.getenv("MAPS_API_KEY")
 NEARBY_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
 WEBSITE_URL = "https://maps.googleapis.com/maps/api/place/details/json"
 
+# Place Details lookups for search results run in parallel on this many threads
+MAPS_LOOKUP_CONCURRENCY = int(os.getenv("MAPS_LOOKUP_CONCURRENCY", 8))
+# Lookups still running after this long are given up on and leave image_url null
+MAPS_LOOKUP_TIMEOUT_SECONDS = float(os.getenv("MAPS_LOOKUP_TIMEOUT_SECONDS", 2))
+
+_lookup_pool = ThreadPoolExecutor(max_workers=MAPS_LOOKUP_CONCURRENCY, thread_name_prefix="maps-lookup")
+
+# Nearby searches are cached per (keyword, grid cell, radius bucket), so users
+# searching from the same block share one Places request
+NEARBY_CACHE_CELL_DEG = 0.005  # ~550m of latitude
+NEARBY_CACHE_TTL_SECONDS = int(os.getenv("NEARBY_CACHE_TTL_SECONDS", 600))
+NEARBY_CACHE_SIZE = int(os.getenv("NEARBY_CACHE_SIZE", 2000))
+NEARBY_RADIUS_BUCKETS = [500, 1000, 2000, 5000, 10000, 20000, 50000]
+MAX_NEARBY_RADIUS = 50000  # the largest radius the Places API accepts
+
+_nearby_cache = TTLCache(NEARBY_CACHE_SIZE, NEARBY_CACHE_TTL_SECONDS)
+_nearby_flight = SingleFlight("nearby_search")
+
+# A next_page_token only becomes valid a short while after it's issued,
+# until then Places answers INVALID_REQUEST
+NEXT_PAGE_DELAY_SECONDS = 2
+NEXT_PAGE_ATTEMPTS = 3
+
+_FIRST_PAGE = object()  # page token for the first request of a search
+
 def _check_api_key():
     if not MAPS_API_KEY:
         logger.error("Missing API Key: MAPS_API_KEY is not set.")
@@ -22,38 +55,178 @@ def get_restaurant_website(place_id):
         "fields": "name,website",
         "key": MAPS_API_KEY
     }
-    response = requests.get(WEBSITE_URL, params=params)
+    response = http_client.get(WEBSITE_URL, params=params, upstream="maps.place_details", timeout=MAPS_LOOKUP_TIMEOUT_SECONDS)
 
     if response.status_code != 200:
         logger.error(f"Failed API Request: {WEBSITE_URL} responded with status code {response.status_code}.")
-        return None
+        response.raise_for_status()
 
     data = response.json()
 
-    return data.get("result", {}).get("website", None)
-
-def search_nearby_restaurants(keyword, latitude, longitude, radius):
-    from server import get_restaurant_image_url
+    # raise on transient errors so they aren't cached as "no website"
+    if data.get("status") in ("OVER_QUERY_LIMIT", "REQUEST_DENIED", "UNKNOWN_ERROR"):
+        raise RuntimeError(f"Place Details request for {place_id} failed with status {data['status']}")
 
-    if not _check_api_key():
-        return []
+    return data.get("result", {}).get("website", None)
 
-    params = {
-        "keyword": keyword,
-        "location": f"{latitude},{longitude}",
-        "radius": radius,
-        "key": MAPS_API_KEY,
-        "type": "restaurant",
-    }
+def fill_image_urls(restaurants, image_cache, lookup_image_url):
+    """Sets every restaurant's logo, leaving image_url null for the slow ones.
+
+    Logos come from image_cache, a PlaceImageCache, misses are looked up
+    concurrently with lookup_image_url(place_id).
+    """
+    futures = {}
+    for restaurant in restaurants:
+        found, image_url = image_cache.get(restaurant["place_id"])
+        if found:
+            restaurant["image_url"] = image_url
+        else:
+            futures[_lookup_pool.submit(lookup_image_url, restaurant["place_id"])] = restaurant
+
+    if not futures:
+        return restaurants
+
+    done, not_done = wait(futures, timeout=MAPS_LOOKUP_TIMEOUT_SECONDS)
+
+    for future in done:
+        futures[future]["image_url"] = future.result()
+
+    for future in not_done:
+        future.cancel()
+
+    if not_done:
+        metrics.increment("maps.logo_lookup_timeouts", len(not_done))
+        logger.warning(f"Logo lookup timed out for {len(not_done)} of {len(futures)} restaurants")
+
+    return restaurants
+
+def nearby_cache_key(keyword, latitude, longitude, radius):
+    """Snaps a search to (normalized keyword, grid row, grid column, radius bucket)."""
+    normalized_keyword = " ".join((keyword or "").lower().split())
+    radius_bucket = next((bucket for bucket in NEARBY_RADIUS_BUCKETS if radius <= bucket), MAX_NEARBY_RADIUS)
+
+    return (
+        normalized_keyword,
+        round(latitude / NEARBY_CACHE_CELL_DEG),
+        round(longitude / NEARBY_CACHE_CELL_DEG),
+        radius_bucket,
+    )
+
+def _search_cell_page(key, pages, page_token):
+    """Fetches the cell's next page and caches every page fetched so far with the token after it."""
+    keyword, row, col, radius_bucket = key
+
+    if page_token is _FIRST_PAGE:
+        # search from the cell's center, far enough out to cover any caller in the cell
+        cell_padding = NEARBY_CACHE_CELL_DEG * distance.EARTH_RADIUS_M * np.pi / 180
+        search_radius = min(radius_bucket + cell_padding, MAX_NEARBY_RADIUS)
+        result = fetch_nearby_page(keyword, row * NEARBY_CACHE_CELL_DEG, col * NEARBY_CACHE_CELL_DEG, search_radius)
+    else:
+        result = fetch_nearby_page(page_token=page_token)
+
+    # failed searches aren't cached
+    if result is None:
+        return None
 
-    # Make the request to the Google Places API
-    response = requests.get(NEARBY_SEARCH_URL, params=params)
+    restaurants, next_page_token = result
+    pages = pages + (restaurants,)
+    _nearby_cache.set(key, (pages, next_page_token))
+    return pages, next_page_token
 
-    if response.status_code != 200 or response.json().get("status") != "OK":
-        logger.error(f"API Request Error for search_nearby_restaurants\nError:{response.json()}")
+def _nearest_first(restaurants, latitude, longitude, radius):
+    """The restaurants within radius of the point, as copies sorted by distance."""
+    if not restaurants:
         return []
 
-    places = response.json()
+    indices, distances = distance.within_radius(
+        latitude, longitude,
+        [restaurant["coordinates"]["latitude"] for restaurant in restaurants],
+        [restaurant["coordinates"]["longitude"] for restaurant in restaurants],
+        radius,
+    )
+    return [dict(restaurants[i]) for i in indices[np.argsort(distances, kind="stable")]]
+
+def iter_nearby_pages(keyword, latitude, longitude, radius, image_cache, lookup_image_url, limit=None, max_pages=None):
+    """Yields the restaurants within radius of the point one Places page at a time, each page nearest first.
+
+    Logos are filled in with `fill_image_urls`. The next page is only requested once the caller asks for it, and not at
+    all once `limit` restaurants have been yielded or `max_pages` Places pages
+    read. Pages already fetched for the same cell come from the nearby search
+    cache, concurrent requests for the same page share one Places request.
+    """
+    if not _check_api_key():
+        return
+
+    key = nearby_cache_key(keyword, latitude, longitude, radius)
+    entry = _nearby_cache.get(key)
+
+    if entry is MISSING:
+        metrics.increment("nearby_cache.misses")
+        pages, page_token = (), _FIRST_PAGE
+    else:
+        metrics.increment("nearby_cache.hits")
+        pages, page_token = entry
+
+    page_number = 0
+    remaining = limit
+    while (remaining is None or remaining > 0) and (max_pages is None or page_number < max_pages):
+        if page_number == len(pages):
+            if page_token is None:
+                return
+
+            result = _nearby_flight.do((key, page_token), _search_cell_page, key, pages, page_token)
+            if result is None:
+                return
+            pages, page_token = result
+
+        # the cell was searched from its center, rank each page for the caller's real position.
+        # Cached pages have no logos, they are filled per request so a lookup that timed out
+        # earlier shows up as soon as it lands in the place cache
+        page = _nearest_first(pages[page_number], latitude, longitude, radius)[:remaining]
+        page = fill_image_urls(page, image_cache, lookup_image_url)
+        page_number += 1
+
+        if remaining is not None:
+            remaining -= len(page)
+        if page:
+            yield page
+
+def fetch_nearby_page(keyword=None, latitude=None, longitude=None, radius=None, page_token=None):
+    """Runs one Places nearby search request, or fetches the page after it with page_token.
+
+    Returns (restaurants, next_page_token), or None if the request failed.
+    """
+    if page_token is None:
+        params = {
+            "keyword": keyword,
+            "location": f"{latitude},{longitude}",
+            "radius": radius,
+            "key": MAPS_API_KEY,
+            "type": "restaurant",
+        }
+        attempts = 1
+    else:
+        params = {"pagetoken": page_token, "key": MAPS_API_KEY}
+        attempts = NEXT_PAGE_ATTEMPTS
+
+    try:
+        for attempt in range(attempts):
+            if page_token is not None:
+                time.sleep(NEXT_PAGE_DELAY_SECONDS)
+
+            # Make the request to the Google Places API
+            response = http_client.get(NEARBY_SEARCH_URL, params=params, upstream="maps.nearby_search", timeout=MAPS_LOOKUP_TIMEOUT_SECONDS)
+            places = response.json()
+
+            if response.status_code != 200 or places.get("status") != "INVALID_REQUEST":
+                break
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"API Request Error for search_nearby_restaurants\nError:{e}")
+        return None
+
+    if response.status_code != 200 or places.get("status") not in ("OK", "ZERO_RESULTS"):
+        logger.error(f"API Request Error for search_nearby_restaurants\nError:{places}")
+        return None
 
     nearby_restaurants = []
     for place in places.get("results", []):
@@ -68,11 +241,9 @@ def search_nearby_restaurants(keyword, latitude, longitude, radius):
             },
             "display_address": place["vicinity"],
             "Deal": [], # empty deals
-            "image_url": get_restaurant_image_url(place_id)
+            "image_url": None, # filled in when the page is served
         }
 
         nearby_restaurants.append(place_info)
 
-    return nearby_restaurants
-
-
+    return nearby_restaurants, places.get("next_page_token")
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+
+# Shared outbound HTTP layer: one keep-alive session per upstream host, so
+# repeated calls to Maps or the GPU host reuse their TCP+TLS connections.
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 3))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", 10))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", 0.2))
+
+# only idempotent requests are retried, a POST could have already been acted on
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_sessions = {}
+_lock = threading.Lock()
+
+def _new_session(retries):
+    retry = Retry(
+        total=retries,
+        backoff_factor=HTTP_RETRY_BACKOFF_SECONDS,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False,  # the last response is returned as is
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def session_for(url, retries=HTTP_RETRIES):
+    """The pooled session for the url's scheme and host that retries this many times."""
+    parts = urlsplit(url)
+    key = (parts.scheme, parts.netloc, retries)
+
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = _new_session(retries)
+        return session
+
+def request(method, url, upstream=None, timeout=None, retries=HTTP_RETRIES, **kwargs):
+    """Sends a request on the host's pooled session, recording its latency as `http.<upstream>`.
+
+    upstream defaults to the url's host, timeout to the configured
+    (connect, read) timeouts.
+    """
+    upstream = upstream or urlsplit(url).hostname
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)
+
+    start = time.perf_counter()
+    try:
+        return session_for(url, retries).request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException:
+        metrics.increment(f"http.{upstream}.errors")
+        raise
+    finally:
+        metrics.observe_ms(f"http.{upstream}", (time.perf_counter() - start) * 1000)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import zlib
+from flask import Response, request, stream_with_context
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered without it
+    brotli = None
+
+# Serialized bytes gathered before a compressed chunk is flushed to the client
+CHUNK_SIZE = 32 * 1024
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Yielded between items to send everything buffered so far, e.g. before a slow step
+FLUSH = object()
+
+def dumps(obj):
+    """Serializes obj to JSON bytes with the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def negotiate_encoding():
+    """Picks br or gzip from the request's Accept-Encoding, or None for identity."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+class _Compressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "gzip":
+            # wbits=31 writes a gzip header instead of a raw zlib stream
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def flush(self, data):
+        """Compresses data and flushes it so the client can decode it right away."""
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == "gzip":
+            return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_FINISH)
+        return b""
+
+def iter_json_array(items, encoding=None):
+    """Yields a JSON array of items in chunks, serializing each item only when it's reached.
+
+    The first item is flushed on its own to keep time to first byte low, the
+    rest are sent roughly CHUNK_SIZE bytes at a time or whenever items yields
+    FLUSH.
+    """
+    compressor = _Compressor(encoding)
+    buffer = bytearray(b"[")
+    first = True
+
+    for item in items:
+        if item is FLUSH:
+            if buffer:
+                yield compressor.flush(bytes(buffer))
+                buffer.clear()
+            continue
+
+        if not first:
+            buffer += b","
+        buffer += dumps(item)
+
+        if first or len(buffer) >= CHUNK_SIZE:
+            yield compressor.flush(bytes(buffer))
+            buffer.clear()
+        first = False
+
+    buffer += b"]"
+    yield compressor.flush(bytes(buffer)) + compressor.finish()
+
+def streaming_response(items):
+    """Chunked, compressed response streaming items as a JSON array."""
+    encoding = negotiate_encoding()
+    response = Response(stream_with_context(iter_json_array(items, encoding)), mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+def json_response(payload, etag=False):
+    """Buffered, compressed JSON response, with a strong ETag over the uncompressed body if asked."""
+    body = dumps(payload)
+    encoding = negotiate_encoding() if len(body) >= MIN_COMPRESS_SIZE else None
+
+    etag_value = hashlib.sha256(body).hexdigest() if etag else None
+    if encoding:
+        compressor = _Compressor(encoding)
+        body = compressor.flush(body) + compressor.finish()
+
+    response = Response(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if etag_value:
+        # each encoding is a different representation, so it gets its own tag
+        response.set_etag(f"{etag_value}-{encoding}" if encoding else etag_value)
+    return response
@@ -0,0 +1,42 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Process-local counters and timings, served as JSON by the /metrics route.
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = {}
+
+def increment(name, amount=1):
+    """Adds `amount` to the counter `name`."""
+    with _lock:
+        _counters[name] += amount
+
+def observe_ms(name, value_ms):
+    """Records one duration in milliseconds under `name`."""
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        timing["count"] += 1
+        timing["total_ms"] += value_ms
+        timing["max_ms"] = max(timing["max_ms"], value_ms)
+        timing["last_ms"] = value_ms
+
+@contextmanager
+def timed(name):
+    """Times the wrapped block and records it with observe_ms."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_ms(name, (time.perf_counter() - start) * 1000)
+
+def snapshot():
+    """Returns a copy of every counter and timing."""
+    with _lock:
+        timings = {
+            name: dict(timing, avg_ms=timing["total_ms"] / timing["count"])
+            for name, timing in _timings.items()
+        }
+        return {"counters": dict(_counters), "timings": timings}
@@ -0,0 +1,71 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+import metrics
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password operations are already queued."""
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _verify(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def hash_rounds(hashed_password):
+    """The cost factor a bcrypt hash was made with, e.g. 12 for "$2b$12$..."."""
+    return int(hashed_password.split("$")[2])
+
+class PasswordHasher:
+    """Runs bcrypt in a small process pool so password checks don't eat request threads' CPU.
+
+    At most max_pending operations can be queued or running at once, past
+    that calls fail fast with PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self, workers, max_pending, rounds, timeout_seconds):
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout_seconds = timeout_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # created on first use, so gunicorn forks its workers before any pool processes exist.
+        # By then the worker runs background threads, so the pool processes are started from a
+        # clean forkserver (spawn where there is none) instead of forking the threaded worker
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(start_method))
+            return self._pool
+
+    def _run(self, name, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            metrics.increment("passwords.rejected")
+            raise PasswordHasherBusy(f"Too many password operations in flight, rejected {name}")
+
+        try:
+            with metrics.timed(f"passwords.{name}"):
+                return self._get_pool().submit(fn, *args).result(timeout=self.timeout_seconds)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hashes password with the configured cost factor."""
+        return self._run("hash", _hash, password, self.rounds)
+
+    def verify(self, password, hashed_password):
+        return self._run("verify", _verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password):
+        """True if the hash was made with a different cost factor than the configured one."""
+        return hash_rounds(hashed_password) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,80 @@
+import logging
+import sqlite3
+import threading
+import time
+import metrics
+from ttl_cache import MISSING, TTLCache
+
+logger = logging.getLogger('werkzeug')
+
+class PlaceImageCache:
+    """place_id -> logo URL cache, an in-memory LRU in front of a SQLite file.
+
+    A None URL is cached too (negative caching), for places without a website,
+    but for the shorter negative_ttl_seconds in case one gets added.
+    """
+
+    def __init__(self, path, ttl_seconds, negative_ttl_seconds, memory_size=10000):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._memory = TTLCache(memory_size, ttl_seconds)
+        self._lock = threading.Lock()
+
+        # shared by every thread in the worker, writes are serialized by _lock
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS place_images ("
+                "place_id TEXT PRIMARY KEY, image_url TEXT, expires_at REAL NOT NULL)"
+            )
+
+    def _ttl_for(self, image_url):
+        return self.ttl_seconds if image_url else self.negative_ttl_seconds
+
+    def get(self, place_id):
+        """Returns (found, image_url) from memory, then disk."""
+        image_url = self._memory.get(place_id)
+        if image_url is not MISSING:
+            metrics.increment("place_cache.memory_hits")
+            return True, image_url
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT image_url, expires_at FROM place_images WHERE place_id = ?", (place_id,)
+            ).fetchone()
+
+        if row is None or row[1] < time.time():
+            metrics.increment("place_cache.misses")
+            return False, None
+
+        metrics.increment("place_cache.disk_hits")
+        self._memory.set(place_id, row[0], ttl_seconds=row[1] - time.time())
+        return True, row[0]
+
+    def set(self, place_id, image_url):
+        """Caches the place's logo URL in both tiers, None means it has no website."""
+        ttl_seconds = self._ttl_for(image_url)
+        self._memory.set(place_id, image_url, ttl_seconds=ttl_seconds)
+
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO place_images (place_id, image_url, expires_at) VALUES (?, ?, ?)",
+                (place_id, image_url, time.time() + ttl_seconds),
+            )
+
+    def warm(self, entries):
+        """Preloads (place_id, image_url) pairs without overwriting anything already cached.
+
+        Expired rows are purged from disk at the same time.
+        """
+        expires_at = time.time() + self.ttl_seconds
+        rows = [(place_id, image_url, expires_at) for place_id, image_url in entries if image_url]
+
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM place_images WHERE expires_at < ?", (time.time(),))
+            self._db.executemany(
+                "INSERT OR IGNORE INTO place_images (place_id, image_url, expires_at) VALUES (?, ?, ?)", rows
+            )
+
+        logger.info(f"Warmed place image cache with {len(rows)} entries")
+        return len(rows)
@@ -1,16 +1,37 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import os
+import atexit
+import threading
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from datetime import datetime
 import google_maps
-import math
+from spatial_index import RestaurantIndex
+from deal_snapshot import DealSnapshot, UserOverlayCache
+from deal_records import availability_bit, build_restaurant_records, parse_iso_ms
+from deal_index import DealFilter, DealFilterIndex
+from deal_search import DealSearchIndex
+from deal_ranking import DealRanker
+from sweeper import DealSweeper, has_bad_karma
+from vote_buffer import VoteBuffer
+from vote_counters import VoteCounterStore
+from place_cache import PlaceImageCache
+from enrichment_queue import EnrichmentQueue
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from single_flight import SingleFlight
+from ttl_cache import MISSING, TTLCache
+import metrics
+import json_stream
+import http_client
 import logging
+import time
 import pytz
 import hashlib
+import heapq
+import base64
+import json
 import requests
-import bcrypt
 
 # Configure logging
 logger = logging.getLogger('werkzeug')
@@ -29,25 +50,143 @@ app = Flask(__name__)
 
 CORS(app)
 
-######### HELPER FUNCTIONS ##############
-def haversine(lat1, lon1, lat2, lon2):
-	R = 6371000  # Radius of the Earth in meters
-
-	# Convert latitude and longitude from degrees to radians
-	lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-
-	# Differences in coordinates
-	dlat = lat2 - lat1
-	dlon = lon2 - lon1
-
-	# Haversine formula
-	a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-	c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-	# Distance in meters
-	distance = R * c
-	return distance
+# How long a worker serves its deal snapshot before reloading it from Supabase,
+# this is what picks up deals and votes written by other workers
+DEAL_SNAPSHOT_TTL_SECONDS = int(os.getenv("DEAL_SNAPSHOT_TTL_SECONDS", 60))
+USER_OVERLAY_TTL_SECONDS = int(os.getenv("USER_OVERLAY_TTL_SECONDS", 300))
+DEAL_SWEEP_INTERVAL_SECONDS = int(os.getenv("DEAL_SWEEP_INTERVAL_SECONDS", 300))
+VOTE_FLUSH_INTERVAL_SECONDS = float(os.getenv("VOTE_FLUSH_INTERVAL_SECONDS", 1.0))
+VOTE_FLUSH_MAX_PENDING = int(os.getenv("VOTE_FLUSH_MAX_PENDING", 500))
+VOTE_COUNTER_RECONCILE_SECONDS = int(os.getenv("VOTE_COUNTER_RECONCILE_SECONDS", 900))
+
+# Restaurant logos barely change, places without a website are rechecked sooner
+PLACE_CACHE_PATH = os.getenv("PLACE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "place_cache.sqlite3"))
+PLACE_CACHE_TTL_SECONDS = int(os.getenv("PLACE_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+PLACE_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("PLACE_CACHE_NEGATIVE_TTL_SECONDS", 24 * 60 * 60))
+
+# New restaurants are inserted without a logo, it is looked up and backfilled in batches afterwards
+ENRICHMENT_QUEUE_PATH = os.getenv("ENRICHMENT_QUEUE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "enrichment_queue.sqlite3"))
+ENRICHMENT_INTERVAL_SECONDS = float(os.getenv("ENRICHMENT_INTERVAL_SECONDS", 5))
+ENRICHMENT_BATCH_SIZE = int(os.getenv("ENRICHMENT_BATCH_SIZE", 50))
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", 4))
+
+# Supabase returns at most 1000 rows per request
+VOTE_PAGE_SIZE = 1000
+
+# Keeps in_() filters short enough for the request URL
+IN_FILTER_CHUNK_SIZE = 100
+
+# Above this many restaurants /restaurant_deals streams its response instead of buffering it
+STREAM_MIN_RESTAURANTS = int(os.getenv("STREAM_MIN_RESTAURANTS", 200))
+
+# Largest batch /deal_actions accepts, deal ids are sent as one in_() filter
+MAX_DEAL_ACTIONS = IN_FILTER_CHUNK_SIZE
+
+# bcrypt cost factor for new hashes, stored hashes made with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Password hashing runs on its own processes, beyond PASSWORD_MAX_PENDING queued
+# operations logins are turned away instead of starving the other routes
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", 2))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", 32))
+PASSWORD_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_TIMEOUT_SECONDS", 10))
+
+# /get_restaurant details are cached this long per place_id, adding or deleting a deal drops the entry
+RESTAURANT_CACHE_TTL_SECONDS = int(os.getenv("RESTAURANT_CACHE_TTL_SECONDS", 30))
+RESTAURANT_CACHE_SIZE = int(os.getenv("RESTAURANT_CACHE_SIZE", 5000))
+
+# Largest batch /get_restaurants accepts, place ids are sent as one in_() filter
+MAX_BATCH_RESTAURANTS = IN_FILTER_CHUNK_SIZE
+
+# Largest upload /bulk_add_restaurant_deals accepts, rows are inserted BULK_INSERT_CHUNK_SIZE at a time
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", 5000))
+BULK_INSERT_CHUNK_SIZE = 500
+
+# /search_deals returns this many deals by default, at most MAX_SEARCH_RESULTS.
+# A deal at the edge of the radius keeps 1 - SEARCH_DISTANCE_WEIGHT of its text score
+SEARCH_DEFAULT_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+SEARCH_DISTANCE_WEIGHT = 0.5
+
+# /top_deals returns this many deals by default, at most MAX_TOP_DEALS
+TOP_DEALS_DEFAULT = 20
+MAX_TOP_DEALS = 100
+
+# Deal times are minutes since midnight in the zone the app shows them in, which is fixed to EST
+DEALS_TIMEZONE = pytz.timezone(os.getenv("DEALS_TIMEZONE", "EST"))
+
+# Set to false to run without the background threads, e.g. in one-off scripts
+BACKGROUND_WORKERS_ENABLED = os.getenv("BACKGROUND_WORKERS_ENABLED", "true").lower() == "true"
+
+restaurant_index = RestaurantIndex()
+deal_filter_index = DealFilterIndex()
+deal_search_index = DealSearchIndex()
+deal_ranker = DealRanker()
+
+# concurrent identical reads share one Supabase call, see single_flight.<name>.deduplicated in /metrics
+snapshot_flight = SingleFlight("get_all_restaurant_deals")
+restaurant_flight = SingleFlight("get_restaurant")
+deal_flight = SingleFlight("get_deal_by_id")
+
+def rebuild_deal_indexes(snapshot):
+	restaurant_index.rebuild(snapshot.restaurant_locations())
+	deal_filter_index.rebuild(snapshot.restaurant_records())
+	deal_ranker.rebuild(snapshot.restaurant_records())
+	# only the deals that changed since the last snapshot are re-tokenized
+	added, removed = deal_search_index.sync(snapshot.restaurant_records())
+	logger.info(f"Search index updated, {added} deals indexed and {removed} removed")
+
+def forget_removed_deal(deal_id):
+	deal_search_index.remove(deal_id)
+	deal_ranker.remove(deal_id)
+
+# the spatial, filter and ranking indexes are rebuilt from every fresh snapshot, the search index is kept in sync
+deal_snapshot = DealSnapshot(
+	lambda: get_all_restaurant_deals_in_snapshot_db(),
+	DEAL_SNAPSHOT_TTL_SECONDS,
+	on_refresh=rebuild_deal_indexes,
+	on_remove=forget_removed_deal,
+)
+user_overlays = UserOverlayCache(lambda user_id: get_user_overlay_in_db(user_id), USER_OVERLAY_TTL_SECONDS)
+
+deal_sweeper = DealSweeper(supabase, deal_snapshot, DEAL_SWEEP_INTERVAL_SECONDS)
+vote_buffer = VoteBuffer(lambda upserts, deletes: write_votes_in_db(upserts, deletes), VOTE_FLUSH_INTERVAL_SECONDS, VOTE_FLUSH_MAX_PENDING)
+vote_counters = VoteCounterStore(
+	lambda user_id: get_user_votes_in_db(user_id),
+	lambda user_ids: get_votes_in_db(user_ids),
+	VOTE_COUNTER_RECONCILE_SECONDS,
+)
+restaurant_details = TTLCache(RESTAURANT_CACHE_SIZE, RESTAURANT_CACHE_TTL_SECONDS)  # place_id -> raw row or None
+restaurant_place_ids = {}  # restaurant id -> place_id, to drop cached details by restaurant
+place_image_cache = PlaceImageCache(PLACE_CACHE_PATH, PLACE_CACHE_TTL_SECONDS, PLACE_CACHE_NEGATIVE_TTL_SECONDS)
+restaurant_enrichment = EnrichmentQueue(
+	ENRICHMENT_QUEUE_PATH,
+	lambda place_id: fetch_restaurant_image_url(place_id),
+	lambda image_urls: backfill_restaurant_images_in_db(image_urls),
+	ENRICHMENT_INTERVAL_SECONDS,
+	ENRICHMENT_BATCH_SIZE,
+	ENRICHMENT_WORKERS,
+)
+password_hasher = PasswordHasher(PASSWORD_WORKERS, PASSWORD_MAX_PENDING, BCRYPT_ROUNDS, PASSWORD_TIMEOUT_SECONDS)
+
+# queued votes are written out even if the worker shuts down between flushes
+atexit.register(vote_buffer.stop)
+atexit.register(password_hasher.shutdown)
+
+# With `python server.py` the password pool processes import this file again as __mp_main__,
+# they only run bcrypt and must not start any of the threads below
+IN_POOL_PROCESS = __name__ == "__mp_main__"
+
+# always running, acknowledged votes would otherwise only be written at exit
+if not IN_POOL_PROCESS:
+	vote_buffer.start()
+
+if BACKGROUND_WORKERS_ENABLED and not IN_POOL_PROCESS:
+	deal_sweeper.start()
+	vote_counters.start()
+	restaurant_enrichment.start()
+	threading.Thread(target=lambda: warm_place_cache(), name="place-cache-warm", daemon=True).start()
 
+######### HELPER FUNCTIONS ##############
 def iso_to_unix(iso_string):
 	"""Converts an ISO 8601 string to a Unix timestamp."""
 	try:
@@ -58,46 +197,53 @@ def iso_to_unix(iso_string):
 		logger.error(f"Error parsing ISO string: {str(e)}", exc_info=True)
 		return None
 
-def remove_vote_in_db(user_id, deal_id):
-	"""Remove vote for given deal and user in Supabase."""
-	try:
-		existing_entry = supabase.from_('Vote').select('user_id', 'deal_id') \
-			.eq('user_id', user_id).eq('deal_id', deal_id).execute()
+def queue_vote(user_id, deal_id, vote_type):
+	"""Queues a vote for the given deal and user in the vote buffer, returns (success, message)."""
+	# checked before acknowledging, a bad row would only fail later in the flush
+	if not user_id or not deal_id:
+		return False, "Error: user_id and deal_id are required"
+	if vote_type not in ("UPVOTE", "DOWNVOTE", "NEUTRAL"):
+		return False, "Error: Invalid vote type"
 
-		if not existing_entry.data:
-			return jsonify({"success": False, "message": "Vote is not saved in Supabase"})
+	previous_vote = get_cached_user_vote(user_id, deal_id)
 
-		response = supabase.from_('Vote').delete().eq('user_id', user_id).eq('deal_id', deal_id).execute()
+	# NEUTRAL is always queued, the overlay may not have seen a vote made on
+	# another worker and deleting a missing row is a no-op
+	vote_buffer.enqueue(user_id, deal_id, vote_type)
+	record_vote_locally(user_id, deal_id, previous_vote, vote_type)
 
-		if response.data:
-			return jsonify({"success": True, "message": "Vote deleted successfully"})
-		else:
-			logger.error(f"Failed to delete vote", exc_info=True)
-			return jsonify({"success": False, "message": "Failed to delete vote"})
+	if vote_type == "NEUTRAL":
+		return True, "Vote deleted successfully"
+	return True, f"Vote updated successfully with {vote_type}"
+
+def remove_vote_in_db(user_id, deal_id):
+	"""Queues the removal of the vote for given deal and user in Supabase."""
+	try:
+		success, message = queue_vote(user_id, deal_id, "NEUTRAL")
+		return jsonify({"success": success, "message": message})
 
 	except Exception as e:
 		logger.error(f"Error updating vote deal: {str(e)}", exc_info=True)
 		return jsonify({"success": False, "message": f"Error deleting deal vote: {str(e)}"})
 
 def update_vote_in_db(user_id, deal_id, vote_type):
-	"""Update vote for the given deal and user in Supabase."""
+	"""Queues the vote for the given deal and user to be written to Supabase."""
 	try:
-		response = supabase.from_('Vote').upsert({
-			'user_id': user_id,
-			'deal_id': deal_id,
-			'user_vote': vote_type
-		}).execute()
-
-		if response.data:
-			return jsonify({"success": True, "message": f"Vote updated successfully with {vote_type}"})
-		else:
-			logger.error(f"Failed to update vote", exc_info=True)
-			return jsonify({"success": False, "message": f"Failed to update vote with {vote_type}"})
+		success, message = queue_vote(user_id, deal_id, vote_type)
+		return jsonify({"success": success, "message": message})
 
 	except Exception as e:
 		logger.error(f"Error updating vote deal: {str(e)}", exc_info=True)
 		return jsonify({"success": False, "message": f"Error updating deal vote: {str(e)}"})
 
+def write_votes_in_db(upserts, deletes):
+	"""Writes a batch of coalesced votes to Supabase, `deletes` maps user_id to deal ids."""
+	if upserts:
+		supabase.from_('Vote').upsert(upserts).execute()
+
+	for user_id, deal_ids in deletes.items():
+		supabase.from_('Vote').delete().eq('user_id', user_id).in_('deal_id', deal_ids).execute()
+
 def mark_deal_removed_in_db(deal_id):
 	"""Marks deal as expired given the deal id."""
 	try:
@@ -106,30 +252,40 @@ def mark_deal_removed_in_db(deal_id):
 		if not response.data:
 			raise response.error
 
+		deal_snapshot.remove_deal(deal_id)
+		invalidate_restaurant_details(restaurant_id=response.data[0]["restaurant_id"])
+
 	except Exception as e:
 		logger.error(f"Error marking deal as removed: {str(e)}", exc_info=True)
 
+def save_deals_in_db(user_id, deal_ids):
+	"""Saves the deals for the user in one idempotent upsert, returns the ids that weren't saved before."""
+	rows = [{"user_id": user_id, "deal_id": deal_id} for deal_id in deal_ids]
+
+	# duplicates are skipped, so only newly inserted rows come back
+	response = supabase.from_('Saved').upsert(rows, on_conflict="user_id,deal_id", ignore_duplicates=True).execute()
+
+	for deal_id in deal_ids:
+		user_overlays.set_saved(user_id, deal_id, True)
+
+	return {row["deal_id"] for row in response.data}
+
+def unsave_deals_in_db(user_id, deal_ids):
+	"""Removes the user's saved deals in one delete, returns the ids that were actually saved."""
+	response = supabase.from_('Saved').delete().eq('user_id', user_id).in_('deal_id', deal_ids).execute()
+
+	for deal_id in deal_ids:
+		user_overlays.set_saved(user_id, deal_id, False)
+
+	return {row["deal_id"] for row in response.data}
+
 def mark_deal_saved_in_db(deal_id, user_id):
 	"""Marks deal as saved given the deal id and user_id."""
 	try:
-		# Check if the deal is already saved
-		existing_entry = supabase.from_('Saved').select('user_id', 'deal_id') \
-			.eq('user_id', user_id).eq('deal_id', deal_id).execute()
-
-		if existing_entry.data:  # If the entry exists
+		if deal_id not in save_deals_in_db(user_id, [deal_id]):
 			return jsonify({"success": False, "message": "Deal is already saved"})
 
-		# Insert into 'Saved' table
-		response = supabase.from_('Saved').insert({
-			"user_id": user_id,
-			"deal_id": deal_id
-		}).execute()
-
-		if response.data:
-			return jsonify({"success": True, "message": "Deal saved successfully"})
-		else:
-			logger.error(f"Error saving deal in Supabase")
-			return jsonify({"success": False, "message": "Failed to save deal"})
+		return jsonify({"success": True, "message": "Deal saved successfully"})
 
 	except Exception as e:
 		logger.error(f"Error marking deal as saved: {str(e)}", exc_info=True)
@@ -138,26 +294,76 @@ def mark_deal_saved_in_db(deal_id, user_id):
 def unmark_deal_saved_in_db(deal_id, user_id):
 	"""Removes a saved deal given the deal_id and user_id."""
 	try:
-		# Check if the deal is saved
-		existing_entry = supabase.from_('Saved').select('user_id', 'deal_id') \
-			.eq('user_id', user_id).eq('deal_id', deal_id).execute()
-
-		if not existing_entry.data:  # If the entry does NOT exist
+		if deal_id not in unsave_deals_in_db(user_id, [deal_id]):
 			return jsonify({"success": False, "message": "Deal is not saved in Supabase"})
 
-		# Delete the saved deal
-		response = supabase.from_('Saved').delete().eq('user_id', user_id).eq('deal_id', deal_id).execute()
-
-		if response.data:
-			return jsonify({"success": True, "message": "Deal unsaved successfully"})
-		else:
-			logger.error(f"Error unsaving deal: {str(response)}", exc_info=True)
-			return jsonify({"success": False, "message": "Failed to unsave deal"})
+		return jsonify({"success": True, "message": "Deal unsaved successfully"})
 
 	except Exception as e:
 		logger.error(f"Error unsaving deal: {str(e)}", exc_info=True)
 		return jsonify({"success": False, "message": f"Error unsaving deal: {str(e)}"})
 
+def apply_deal_actions(user_id, actions):
+	"""Applies a batch of save, unsave and vote actions for one user, returns a result per action.
+
+	Saves and unsaves are grouped into one upsert and one delete, with the last
+	action on a deal winning. Votes go through the vote buffer.
+	"""
+	results = [None] * len(actions)
+	last_save_action = {}  # deal_id -> index of the last save/unsave action on it
+
+	for index, action in enumerate(actions):
+		if not isinstance(action, dict):
+			results[index] = {"success": False, "message": "Error: Invalid action"}
+			continue
+
+		kind = action.get("action")
+		deal_id = action.get("deal_id")
+
+		if not deal_id or not isinstance(deal_id, str) or kind not in ("save", "unsave", "vote"):
+			results[index] = {"success": False, "message": "Error: Invalid action"}
+		elif kind == "vote":
+			vote_type = action.get("user_vote")
+			if vote_type not in ("UPVOTE", "DOWNVOTE", "NEUTRAL"):
+				results[index] = {"success": False, "message": "Error: Invalid vote type"}
+			else:
+				success, message = queue_vote(user_id, deal_id, vote_type)
+				results[index] = {"success": success, "message": message}
+		else:
+			previous = last_save_action.get(deal_id)
+			if previous is not None:
+				results[previous] = {"success": True, "message": "Superseded by a later action"}
+			last_save_action[deal_id] = index
+
+	to_save = [deal_id for deal_id, index in last_save_action.items() if actions[index]["action"] == "save"]
+	to_unsave = [deal_id for deal_id, index in last_save_action.items() if actions[index]["action"] == "unsave"]
+
+	for deal_ids, write, done_message, noop_message in (
+		(to_save, save_deals_in_db, "Deal saved successfully", "Deal is already saved"),
+		(to_unsave, unsave_deals_in_db, "Deal unsaved successfully", "Deal is not saved in Supabase"),
+	):
+		if not deal_ids:
+			continue
+
+		try:
+			changed = write(user_id, deal_ids)
+			for deal_id in deal_ids:
+				results[last_save_action[deal_id]] = {
+					"success": deal_id in changed,
+					"message": done_message if deal_id in changed else noop_message,
+				}
+		except Exception as e:
+			logger.error(f"Error applying deal actions: {str(e)}", exc_info=True)
+			for deal_id in deal_ids:
+				results[last_save_action[deal_id]] = {"success": False, "message": f"Error: {str(e)}"}
+
+	for action, result in zip(actions, results):
+		fields = action if isinstance(action, dict) else {}
+		result["action"] = fields.get("action")
+		result["deal_id"] = fields.get("deal_id")
+
+	return results
+
 def get_user_by_id(user_id):
 	"""Fetch user details from Supabase by user_id."""
 	try:
@@ -173,28 +379,10 @@ def get_user_by_id(user_id):
 		logger.error(f"Database query error: {str(e)}", exc_info=True)
 		return None
 
-def get_user_upvote(user_id):
-    response = supabase.table("Vote") \
-            .select("user_vote", count="exact") \
-            .eq("user_id", user_id) \
-            .eq("user_vote", "UPVOTE") \
-            .execute()
-
-    return response.count if response.count is not None else 0
-
-def get_user_downvote(user_id):
-    response = supabase.table("Vote") \
-                .select("user_vote", count="exact") \
-                .eq("user_id", user_id) \
-                .eq("user_vote", "DOWNVOTE") \
-                .execute()
-
-    return response.count if response.count is not None else 0
-
 def get_deal_by_id(deal_id):
 	"""Fetches the deal by the id from Supabase."""
 	try:
-		result = supabase.from_('Deal').select('*').eq('id', deal_id).execute()
+		result = deal_flight.do(deal_id, lambda: supabase.from_('Deal').select('*').eq('id', deal_id).execute())
 
 		if result.data:
 			return result.data[0]
@@ -215,90 +403,235 @@ def get_all_restaurant_deals_in_db():
 		logger.error(f"Failed to fetch restaurant deals: {str(e)}", exc_info=True)
 		return []
 
-def group_deals_by_restaurant(response_data):
-	restaurant_map = {}
-
-	for deal in response_data:
-		rest_id = deal["restaurant_id"]
-
-		# initialize restaurant
-		restaurant = restaurant_map.setdefault(rest_id, {
-			"id": rest_id,
-			"place_id": deal["place_id"],
-			"coordinates": {
-				"latitude": deal["latitude"],
-				"longitude": deal["longitude"]
-			},
-			"restaurant_name": deal["restaurant_name"],
-			"display_address": deal["display_address"],
-			"image_url": deal["image_url"],
-			"Deal": []
-		})
-
-		# Append deal details to restaurant
-		restaurant["Deal"].append({
-			"id": deal["id"],
-			"item": deal["item"],
-			"description": deal["description"],
-			"type": deal["type"],
-			"expiry_date": deal["expiry_date"],
-			"date_posted": deal["date_posted"],
-			"user_id": deal["user_id"],
-			"username": deal["username"],
-			"price": deal["price"],
-			"image_id": deal["image_id"],
-			"user_saved": deal["user_saved"],
-			"user_vote": deal["user_vote"],
-			"applicable_group": deal["applicable_group"],
-			"daily_start_times": deal["start_times"],
-			"daily_end_times": deal["end_times"],
-			"num_upvote": deal["upvotes"],
-			"num_downvote": deal["downvotes"]
-		})
-
-	return list(restaurant_map.values())
-
 def get_user_saved_restaurant_deals(user_id):
-	"""Fetches all saved restaurants and their deals from Supabase, along with user saved status."""
+	"""Gets the user's saved restaurants and deals from the deal snapshot."""
 	try:
-		response = supabase.rpc('get_user_saved_restaurant_deals', params={"target_user_id": user_id}).execute()
-		data = response.data
+		overlay = user_overlays.get(user_id)
+		if not overlay or not overlay.saved:
+			return []
+
+		snapshot = deal_snapshot.ensure_fresh()
+		restaurant_ids = snapshot.restaurant_ids_for_deals(overlay.saved)
 
-		return group_deals_by_restaurant(data)
+		return snapshot.materialize(restaurant_ids, overlay, deal_ids=overlay.saved)
 
 	except Exception as e:
 		logger.error(f"Failed to fetch saved restaurant data: {str(e)}", exc_info=True)
 		return []
 
-def get_all_restaurant_deals_with_user_details_in_db(user_id=None):
-	"""Fetches all restaurants and their deals from Supabase, along with user saved status."""
-	try:
-		# the query, get_all_restaurant_deals, can be viewed in supabase terminal using `SELECT pg_get_functiondef('get_all_restaurant_deals'::regproc);`
-		# NOTE: if you want to change what it returns, you need to modify `get_all_restaurant_deals`, ask joyce if you need help
-		response = supabase.rpc('get_all_restaurant_deals', params={"target_user_id": user_id}).execute()
-		data = response.data
+def get_all_restaurant_deals_in_snapshot_db():
+	"""Fetches all restaurants and their deals from Supabase without any user details.
+
+	Raises on failure so the snapshot keeps its previous contents.
+	"""
+	# the query, get_all_restaurant_deals, can be viewed in supabase terminal using `SELECT pg_get_functiondef('get_all_restaurant_deals'::regproc);`
+	# NOTE: if you want to change what it returns, you need to modify `get_all_restaurant_deals`, ask joyce if you need help
+	# write out queued votes first so the reloaded totals include them
+	vote_buffer.flush()
+
+	response = snapshot_flight.do(
+		"get_all_restaurant_deals",
+		lambda: supabase.rpc('get_all_restaurant_deals', params={"target_user_id": None}).execute(),
+	)
+
+	return build_restaurant_records(response.data)
+
+def get_user_overlay_in_db(user_id):
+	"""Fetches the deal ids the user saved and their votes from Supabase."""
+	saved = supabase.from_('Saved').select('deal_id').eq('user_id', user_id).execute()
+
+	return {row["deal_id"] for row in saved.data}, get_user_votes_in_db(user_id)
+
+def get_user_votes_in_db(user_id):
+	"""Fetches {deal_id: user_vote} for the user from Supabase, including votes still in the vote buffer."""
+	# paged, a single select is capped at 1000 rows by Supabase
+	user_votes = {}
+	start = 0
+	while True:
+		query = supabase.from_('Vote').select('deal_id', 'user_vote').eq('user_id', user_id)
+		rows = query.order('deal_id').range(start, start + VOTE_PAGE_SIZE - 1).execute().data
+		user_votes.update((row["deal_id"], row["user_vote"]) for row in rows)
+
+		if len(rows) < VOTE_PAGE_SIZE:
+			break
+		start += VOTE_PAGE_SIZE
+
+	# votes still waiting in the write-behind buffer are newer than what Supabase has
+	for deal_id, vote_type in vote_buffer.pending_votes(user_id).items():
+		if vote_type == "NEUTRAL":
+			user_votes.pop(deal_id, None)
+		else:
+			user_votes[deal_id] = vote_type
 
-		return group_deals_by_restaurant(data)
+	return user_votes
 
-	except Exception as e:
-		logger.error(f"Failed to fetch restaurant data: {str(e)}", exc_info=True)
-		return []
+def get_votes_in_db(user_ids=None):
+	"""Yields (user_id, user_vote) for every vote cast by the given users, or by everyone, a page at a time."""
+	# write out queued votes first so the counts include them
+	vote_buffer.flush()
+
+	user_chunks = [None] if user_ids is None else [user_ids[i:i + IN_FILTER_CHUNK_SIZE] for i in range(0, len(user_ids), IN_FILTER_CHUNK_SIZE)]
+	for chunk in user_chunks:
+		start = 0
+		while True:
+			query = supabase.from_('Vote').select('user_id', 'user_vote')
+			if chunk is not None:
+				query = query.in_('user_id', chunk)
+			rows = query.order('user_id').order('deal_id').range(start, start + VOTE_PAGE_SIZE - 1).execute().data
+
+			yield from ((row["user_id"], row["user_vote"]) for row in rows)
+
+			if len(rows) < VOTE_PAGE_SIZE:
+				break
+			start += VOTE_PAGE_SIZE
+
+def get_cached_user_vote(user_id, deal_id):
+	"""Returns the user's current vote on the deal from their overlay."""
+	overlay = user_overlays.get(user_id)
+	return overlay.votes.get(deal_id) if overlay else None
+
+def record_vote_locally(user_id, deal_id, previous_vote, vote_type):
+	"""Applies a vote that was written to Supabase to the cached snapshot and user overlay."""
+	user_overlays.set_vote(user_id, deal_id, vote_type)
+	vote_counters.apply(user_id, previous_vote, vote_type)
+	deal_snapshot.apply_vote(deal_id, previous_vote, vote_type)
+	deal_ranker.record_vote(deal_id, previous_vote, vote_type)
+
+def get_nearby_restaurant_ids(user_lat, user_long, radius, slot_bit=None):
+	"""Gets the ids of the restaurants with deals within the radius of the user, and available in the slot if given."""
+	snapshot = deal_snapshot.ensure_fresh()
+
+	# only the grid cells around the user are scanned, then the exact distance is checked in one batch
+	restaurant_ids = [restaurant_id for restaurant_id, _ in restaurant_index.query_radius(user_lat, user_long, radius)]
+
+	if slot_bit is not None:
+		restaurant_ids = snapshot.available_restaurant_ids(restaurant_ids, slot_bit)
+	return restaurant_ids
 
 def get_restaurants_given_filters(user_lat, user_long, radius, user_id):
 	"""Filter restaurants based on user location and radius."""
-	restaurant_deals = get_all_restaurant_deals_with_user_details_in_db(user_id)
-	filtered_restaurants = []
+	nearby_restaurant_ids = get_nearby_restaurant_ids(user_lat, user_long, radius)
+	if not nearby_restaurant_ids:
+		return []
+
+	return deal_snapshot.materialize(nearby_restaurant_ids, user_overlays.get(user_id))
 
-	for restaurant in restaurant_deals:
-		res_lat = restaurant["coordinates"]["latitude"]
-		res_long = restaurant["coordinates"]["longitude"]
-		distance = haversine(res_lat, res_long, user_lat, user_long)
+def get_slot_bit_given_filters(args):
+	"""Reads open_now=true or available_at (epoch ms) from the query, returns the availability slot bit or None."""
+	if args.get('open_now', '').lower() == 'true':
+		available_at = int(time.time() * 1000)
+	elif args.get('available_at') is not None:
+		available_at = int(args.get('available_at'))
+	else:
+		return None
 
-		# check if restaurant distance is within user location
-		if distance <= radius:
-			filtered_restaurants.append(restaurant)
+	return availability_bit(available_at, DEALS_TIMEZONE)
+
+def get_deal_filter_given_filters(args):
+	"""Reads the deal_types, applicable_groups (comma separated), min_price and max_price filters from the query.
+
+	Deals for everyone always pass the applicable_groups filter. Returns a
+	DealFilter, or None without any filter.
+	"""
+	def comma_list(name):
+		value = args.get(name)
+		return {item.strip().upper() for item in value.split(',') if item.strip()} if value else None
+
+	min_price = args.get('min_price')
+	max_price = args.get('max_price')
+	deal_filter = DealFilter(
+		types=comma_list('deal_types'),
+		groups=comma_list('applicable_groups'),
+		min_price=float(min_price) if min_price is not None else None,
+		max_price=float(max_price) if max_price is not None else None,
+	)
+	return deal_filter if any(value is not None for value in deal_filter) else None
+
+def filter_restaurant_deals(restaurant_ids, deal_filter):
+	"""Applies the deal filter to the candidate restaurants, returns (restaurant ids with a match, matching deal ids).
+
+	The deal ids are None without a filter.
+	"""
+	if deal_filter is None:
+		return restaurant_ids, None
+
+	matches = deal_filter_index.matching_deals(restaurant_ids, deal_filter)
+	return list(matches), {deal_id for deal_ids in matches.values() for deal_id in deal_ids}
+
+def encode_page_cursor(distance, restaurant_id):
+	"""Makes an opaque cursor for the position right after (distance, restaurant_id)."""
+	return base64.urlsafe_b64encode(json.dumps([distance, restaurant_id]).encode('utf-8')).decode('utf-8')
+
+def decode_page_cursor(cursor):
+	"""Reverses encode_page_cursor, raises ValueError on a malformed cursor."""
+	try:
+		distance, restaurant_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+		return float(distance), str(restaurant_id)
+	except Exception as e:
+		raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def get_nearest_restaurants_page(user_lat, user_long, radius, user_id, limit, cursor=None, slot_bit=None, deal_filter=None):
+	"""Gets the `limit` nearest restaurants after the cursor, returns (restaurants, next_cursor).
+
+	Restaurants are ordered by (distance, id) so pages never overlap, and only
+	the page is selected with a bounded heap instead of sorting every candidate.
+	"""
+	snapshot = deal_snapshot.ensure_fresh()
+	after = decode_page_cursor(cursor) if cursor else None
+
+	nearby = restaurant_index.query_radius(user_lat, user_long, radius)
+	if slot_bit is not None:
+		available = set(snapshot.available_restaurant_ids([restaurant_id for restaurant_id, _ in nearby], slot_bit))
+		nearby = [(restaurant_id, distance) for restaurant_id, distance in nearby if restaurant_id in available]
+
+	matching, deal_ids = filter_restaurant_deals([restaurant_id for restaurant_id, _ in nearby], deal_filter)
+	if deal_filter is not None:
+		matching = set(matching)
+		nearby = [(restaurant_id, distance) for restaurant_id, distance in nearby if restaurant_id in matching]
+
+	# ids are compared as strings so the order doesn't depend on their type
+	candidates = ((distance, str(restaurant_id), restaurant_id) for restaurant_id, distance in nearby)
+	if after:
+		candidates = (candidate for candidate in candidates if candidate[:2] > after)
+
+	# one extra tells us whether there is another page
+	page = heapq.nsmallest(limit + 1, candidates)
+	next_cursor = encode_page_cursor(*page[limit - 1][:2]) if len(page) > limit else None
+	page = page[:limit]
+
+	restaurants = snapshot.materialize([restaurant_id for _, _, restaurant_id in page], user_overlays.get(user_id), deal_ids, slot_bit)
+	return restaurants, next_cursor
+
+def get_deal_changes_given_filters(user_lat, user_long, radius, user_id, since, cursor):
+	"""Gets the deals near the user that were added, changed or removed since the `since` cursor."""
+	snapshot = deal_snapshot.ensure_fresh()
+	changes = snapshot.changes_since(since)
+
+	# this worker doesn't know what changed that long ago, send everything
+	if changes is None:
+		restaurants = get_restaurants_given_filters(user_lat, user_long, radius, user_id)
+		return {
+			"cursor": cursor,
+			"full": True,
+			"restaurants": restaurants,
+			"removed_deal_ids": [],
+		}
 
-	return filtered_restaurants
+	changed_deal_ids, removed_deal_ids = changes
+	nearby = restaurant_index.query_radius(user_lat, user_long, radius)
+	restaurants = snapshot.materialize(
+		[restaurant_id for restaurant_id, _ in nearby],
+		user_overlays.get(user_id),
+		deal_ids=changed_deal_ids,
+	)
+
+	return {
+		"cursor": cursor,
+		"full": False,
+		"restaurants": restaurants,
+		# tombstones aren't filtered by radius, ids the client never had are ignored
+		"removed_deal_ids": removed_deal_ids,
+	}
 
 def format_deal(deal):
 	"""Format the deal object."""
@@ -310,55 +643,72 @@ def format_deal(deal):
 		expiry_date = datetime.fromtimestamp(deal['expiry_date'] / 1000, tz=pytz.UTC)
 		today = datetime.now(tz=pytz.UTC)
 
-		# Only keep non-expired deals
+		# Only keep non-expired deals, the sweeper marks them removed in Supabase
 		if expiry_date < today:
-			deal_id = deal['id']
-			logger.info(f"Deal {deal_id} expired and was removed from the valid deals list.")
-			mark_deal_removed_in_db(deal_id)
 			return None
 
-	if "num_downvote" in deal and "num_upvote" in deal:
-		bad_karma_deals = deal["num_downvote"] - deal["num_upvote"] >= 10
-
-		if bad_karma_deals:
-			deal_id = deal['id']
-			logger.info(f"Deal {deal_id} has bad karma and was removed from the valid deals list.")
-			mark_deal_removed_in_db(deal_id)
-			return None
+	# Bad karma deals are also left to the sweeper
+	if "num_downvote" in deal and "num_upvote" in deal and has_bad_karma(deal):
+		return None
 
 	return deal
 
-def process_and_filter_restaurant_deals(restaurants):
-	"""Clean up and format restaurant data before sending to the Android app."""
-	try:
-		for restaurant in restaurants:
-			raw_deals = restaurant["Deal"]
-			formatted_deals = map(format_deal, raw_deals)
-			valid_deals = list(filter(None, formatted_deals))
-			restaurant["Deal"] = valid_deals
+def lookup_restaurant_image_url(place_id):
+	"""Fetches restaurant image URL using Google Favicon API, None if the place has no website."""
+	website = google_maps.get_restaurant_website(place_id)
 
-		return restaurants
+	if not website:
+		logger.warning(f"No website found for place_id: {place_id} which has website {website}")
+		return None
 
-	except Exception as e:
-		logger.error(f"Error processing deal: {e}", exc_info=True)
+	domain = website.replace("https://", "").replace("http://", "").split("/")[0]
+	domain_url = f"https://logo.clearbit.com/{domain}"
+	return domain_url
 
-def get_restaurant_image_url(place_id):
-	"""Fetches restaurant image URL using Google Favicon API."""
-	try:
-		website = google_maps.get_restaurant_website(place_id)
+def fetch_restaurant_image_url(place_id):
+	"""Fetches restaurant image URL, cached by place_id. Raises if the lookup fails, so the failure isn't cached."""
+	found, image_url = place_image_cache.get(place_id)
+	if found:
+		return image_url
 
-		if not website:
-			logger.warning(f"No website found for place_id: {place_id} which has website {website}")
-			return None
+	image_url = lookup_restaurant_image_url(place_id)
+	place_image_cache.set(place_id, image_url)
+	return image_url
 
-		domain = website.replace("https://", "").replace("http://", "").split("/")[0]
-		domain_url = f"https://logo.clearbit.com/{domain}"
-		return domain_url
+def get_restaurant_image_url(place_id):
+	"""Fetches restaurant image URL, cached by place_id, None if the lookup fails."""
+	try:
+		return fetch_restaurant_image_url(place_id)
 
 	except Exception as e:
 		logger.error(f"Failed to get image URL for place_id {place_id}: {str(e)}", exc_info=True)
 		return None
 
+def backfill_restaurant_images_in_db(image_urls):
+	"""Writes {place_id: image_url} to the Restaurant table in one upsert."""
+	place_ids = list(image_urls)
+	restaurants = supabase.from_('Restaurant').select('*').in_('place_id', place_ids).execute().data
+
+	for restaurant in restaurants:
+		restaurant["image_url"] = image_urls[restaurant["place_id"]]
+
+	if restaurants:
+		supabase.from_('Restaurant').upsert(restaurants).execute()
+
+	for place_id in place_ids:
+		invalidate_restaurant_details(place_id=place_id)
+	deal_snapshot.invalidate()
+
+	logger.info(f"Backfilled images for {len(restaurants)} restaurants")
+
+def warm_place_cache():
+	"""Preloads the place image cache from the image_url column of the Restaurant table."""
+	try:
+		result = supabase.from_('Restaurant').select('place_id', 'image_url').not_.is_('image_url', 'null').execute()
+		place_image_cache.warm((row["place_id"], row["image_url"]) for row in result.data)
+	except Exception as e:
+		logger.error(f"Failed to warm place image cache: {str(e)}", exc_info=True)
+
 
 ######### ROUTES ##############
 
@@ -373,14 +723,16 @@ def get_user_info():
 		if not user:
 			return jsonify({"error": f"No user found with id {user_id}"})
 
+		upvote, downvote = vote_counters.get(user_id)
+
 		user_response = {
 			"id": user_id,
 			"username": user['username'],
 			"firstName": user['first_name'],
 			"lastName": user['last_name'],
 			"email": user['email'],
-			"upvote": get_user_upvote(user_id),
-			"downvote": get_user_downvote(user_id),
+			"upvote": upvote,
+			"downvote": downvote,
 		}
 
 		return jsonify({
@@ -406,13 +758,53 @@ def get_deals():
 		user_id = request.args.get('user_id')
 		logger.info(f"Fetching deals for lat: {latitude}, long: {longitude}, radius: {radius}, user: {user_id}")
 
+		# The time the served snapshot was read from Supabase, not the time of the request, so
+		# a change this worker hasn't loaded yet is still after the cursor on any other worker.
+		# Local writes to the snapshot after that are sent again next time, never skipped.
+		# 0 while nothing could be loaded yet, the next sync is then a full one
+		cursor = deal_snapshot.ensure_fresh().as_of_ms or 0
+
+		# Delta sync, only what changed since the client's last cursor.
+		# Not filtered by availability, the client keeps deals outside the window
+		since = request.args.get('since')
+		if since is not None:
+			return jsonify(get_deal_changes_given_filters(latitude, longitude, radius, user_id, int(since), cursor))
+
+		# Only deals available at that time and matching the type, group and price filters,
+		# restaurants without any are left out
+		slot_bit = get_slot_bit_given_filters(request.args)
+		deal_filter = get_deal_filter_given_filters(request.args)
+
+		# Nearest restaurants first, one page at a time
+		limit = request.args.get('limit')
+		if limit is not None:
+			limit = int(limit)
+			if limit <= 0:
+				return jsonify({"error": "limit must be a positive integer"})
+
+			page, next_cursor = get_nearest_restaurants_page(latitude, longitude, radius, user_id, limit, request.args.get('cursor'), slot_bit, deal_filter)
+			response = json_stream.json_response({
+				"restaurants": page,
+				"next_cursor": next_cursor,
+			}, etag=True)
+			response.headers["X-Deals-Cursor"] = str(cursor)
+			return response.make_conditional(request)
+
 		# Filter restaurants based on coords and radius
-		filtered_restaurants = get_restaurants_given_filters(latitude, longitude, radius, user_id)
+		nearby_restaurant_ids = get_nearby_restaurant_ids(latitude, longitude, radius, slot_bit)
+		nearby_restaurant_ids, deal_ids = filter_restaurant_deals(nearby_restaurant_ids, deal_filter)
+		# Response dicts are built from the snapshot's records as they are serialized
+		formatted_restaurants = deal_snapshot.iter_materialized(nearby_restaurant_ids, user_overlays.get(user_id), deal_ids, slot_bit)
 
-		# Format the restaurant data
-		formatted_restaurants = process_and_filter_restaurant_deals(filtered_restaurants)
+		# Large results are streamed, small ones are buffered so they can carry an ETag
+		if len(nearby_restaurant_ids) > STREAM_MIN_RESTAURANTS and not request.if_none_match:
+			response = json_stream.streaming_response(formatted_restaurants)
+			response.headers["X-Deals-Cursor"] = str(cursor)
+			return response
 
-		return jsonify(formatted_restaurants)
+		response = json_stream.json_response(list(formatted_restaurants), etag=True)
+		response.headers["X-Deals-Cursor"] = str(cursor)
+		return response.make_conditional(request)
 
 	except Exception as e:
 		error_message = str(e)
@@ -420,6 +812,36 @@ def get_deals():
 		return jsonify({"error": "An error occurred while fetching restaurant deals"})
 
 
+def build_restaurant_row(restaurant, image_url):
+	"""Turns a restaurant from the app into a Restaurant table row."""
+	return {
+		"place_id": restaurant.get("place_id"),
+		"restaurant_name": restaurant.get("restaurant_name"),
+		"display_address": restaurant.get("display_address"),
+		"latitude": restaurant["coordinates"]["latitude"],
+		"longitude": restaurant["coordinates"]["longitude"],
+		"image_url": image_url,
+	}
+
+def build_deal_row(deal, restaurant_id):
+	"""Turns a deal from the app into a Deal table row."""
+	user_id = deal.get("user_id", "9f7ab2ec-15d8-4f31-8a33-8e4218a03e90")
+
+	return {
+		"restaurant_id": restaurant_id,
+		"item": deal["item"],
+		"description": deal.get("description"),
+		"type": deal.get("type"),
+		"expiry_date": datetime.fromtimestamp(deal["expiry_date"] / 1000).isoformat() if deal.get("expiry_date") else None,
+		"date_posted": datetime.fromtimestamp(deal["date_posted"] / 1000).isoformat(),
+		"user_id": user_id,
+		"image_id": deal.get("image_id"),
+		"applicable_group": deal.get("applicable_group"),
+		"start_times": deal.get("daily_start_times"),
+		"end_times": deal.get("daily_end_times"),
+		"price": deal.get("price"),
+	}
+
 @app.route('/add_restaurant_deal', methods=["POST"])
 def add_restaurant_deal():
 	"""Adds a new restaurant deal to Supabase."""
@@ -434,44 +856,36 @@ def add_restaurant_deal():
 
 		# Insert restaurant if it doesnt exist
 		if not restaurant_id:
-			image_url = get_restaurant_image_url(restaurant_place_id)
-
-			restaurant_data = {
-				"place_id": restaurant.get("place_id"),
-				"restaurant_name": restaurant.get("restaurant_name"),
-				"display_address": restaurant.get("display_address"),
-				"latitude": restaurant["coordinates"]["latitude"],
-				"longitude": restaurant["coordinates"]["longitude"],
-				"image_url": image_url,
-			}
+			# a logo that isn't cached yet is looked up after the insert, the post doesn't wait on Google
+			found, image_url = place_image_cache.get(restaurant_place_id)
+
+			restaurant_data = build_restaurant_row(restaurant, image_url)
 			response = supabase.from_('Restaurant').insert([restaurant_data]).execute()
 			restaurant_id = response.data[0]['id'] if response.data else None
 			logger.info(f"Added new restaurant: {restaurant.get('restaurant_name')}")
 
+			if restaurant_id:
+				restaurant_index.insert(restaurant_id, restaurant_data["latitude"], restaurant_data["longitude"])
+				if not found:
+					restaurant_enrichment.enqueue(restaurant_place_id)
+
 		# Insert deal
 		deal = restaurant.get("Deal", [None])[0]
 		if deal:
-			user_id = deal.get("user_id", "9f7ab2ec-15d8-4f31-8a33-8e4218a03e90")
-
-			deal_item = {
-				"restaurant_id": restaurant_id,
-				"item": deal["item"],
-				"description": deal.get("description"),
-				"type": deal.get("type"),
-				"expiry_date": datetime.fromtimestamp(deal["expiry_date"] / 1000).isoformat() if deal.get("expiry_date") else None,
-				"date_posted": datetime.fromtimestamp(deal["date_posted"] / 1000).isoformat(),
-				"user_id": user_id,
-				"image_id": deal.get("image_id"),
-				"applicable_group": deal.get("applicable_group"),
-				"start_times": deal.get("daily_start_times"),
-				"end_times": deal.get("daily_end_times"),
-				"price": deal.get("price"),
-			}
+			deal_item = build_deal_row(deal, restaurant_id)
 
 			response = supabase.from_('Deal').insert([deal_item]).execute()
 			deal_uuid = response.data[0]['id'] if response.data else None
 			logger.info(f"Added new deal: {deal['item']} for restaurant {restaurant.get('restaurant_name')}")
 
+			if deal_uuid:
+				deal_search_index.add(deal_uuid, restaurant_id, deal_item["item"], deal_item.get("description"))
+				deal_ranker.add(deal_uuid, restaurant_id, parse_iso_ms(deal_item["date_posted"]), parse_iso_ms(deal_item["expiry_date"]))
+
+			# the new deal only has its user details after a reload through the RPC
+			deal_snapshot.invalidate()
+			invalidate_restaurant_details(place_id=restaurant_place_id)
+
 			return jsonify({"dealId": str(deal_uuid)})
 
 	except Exception as e:
@@ -479,6 +893,167 @@ def add_restaurant_deal():
 		logger.error(f"Error occurred at add_restaurant_deal: {error_message}", exc_info=True)
 		return jsonify({"error": "An error occurred while adding the deal"})
 
+def bulk_insert_in_db(table, rows):
+	"""Inserts rows in chunks, returns (inserted row, error message) for each row in order.
+
+	A chunk that fails is retried one row at a time, so one bad row doesn't
+	fail the rows inserted with it.
+	"""
+	results = []
+	for i in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+		chunk = rows[i:i + BULK_INSERT_CHUNK_SIZE]
+		try:
+			response = supabase.from_(table).insert(chunk).execute()
+			results.extend((row, None) for row in response.data)
+			continue
+		except Exception as e:
+			logger.warning(f"Bulk insert of {len(chunk)} rows into {table} failed, retrying row by row: {str(e)}")
+
+		for row in chunk:
+			try:
+				results.append((supabase.from_(table).insert([row]).execute().data[0], None))
+			except Exception as e:
+				results.append((None, str(e)))
+
+	return results
+
+def parse_bulk_upload():
+	"""Reads the restaurants of a bulk upload, a JSON array or one JSON object per line (NDJSON).
+
+	Lines that aren't valid JSON come back as None, so they can be reported by position.
+	"""
+	if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+		restaurants = []
+		for line in request.stream:
+			if not line.strip():
+				continue
+			try:
+				restaurants.append(json.loads(line))
+			except ValueError:
+				restaurants.append(None)
+			if len(restaurants) > MAX_BULK_ROWS:
+				break
+		return restaurants
+
+	restaurants = request.get_json()
+	if not isinstance(restaurants, list):
+		raise ValueError("Expected a JSON array of restaurants")
+	return restaurants
+
+def bulk_add_restaurant_deals_in_db(restaurants):
+	"""Adds many restaurants and their deals, returns a result for each restaurant in order.
+
+	Existing restaurants are resolved with in_() lookups, then the missing
+	restaurants and every deal are inserted in chunks.
+	"""
+	results = [{"index": i, "success": True, "deal_ids": []} for i in range(len(restaurants))]
+
+	def fail(i, message):
+		results[i]["success"] = False
+		results[i].setdefault("errors", []).append(message)
+
+	# Step 1: validate every row up front
+	valid = {}
+	for i, restaurant in enumerate(restaurants):
+		try:
+			place_id = restaurant["place_id"]
+			build_restaurant_row(restaurant, None)
+			results[i]["place_id"] = place_id
+			valid[i] = restaurant
+		except (KeyError, TypeError):
+			fail(i, "Invalid restaurant, place_id and coordinates are required")
+
+	# Step 2: resolve the restaurants that already exist
+	place_ids = list(dict.fromkeys(restaurant["place_id"] for restaurant in valid.values()))
+	restaurant_ids = {}
+	for i in range(0, len(place_ids), IN_FILTER_CHUNK_SIZE):
+		response = supabase.from_('Restaurant').select('id', 'place_id').in_('place_id', place_ids[i:i + IN_FILTER_CHUNK_SIZE]).execute()
+		restaurant_ids.update((row["place_id"], row["id"]) for row in response.data)
+
+	# Step 3: insert the missing ones, the first row for a place_id wins
+	new_restaurants = {}
+	for restaurant in valid.values():
+		if restaurant["place_id"] not in restaurant_ids:
+			new_restaurants.setdefault(restaurant["place_id"], restaurant)
+
+	insert_errors = {}
+	needs_logo = []
+	restaurant_rows = []
+	for place_id, restaurant in new_restaurants.items():
+		found, image_url = place_image_cache.get(place_id)
+		if not found:
+			needs_logo.append(place_id)
+		restaurant_rows.append(build_restaurant_row(restaurant, image_url))
+
+	for row, (inserted, error) in zip(restaurant_rows, bulk_insert_in_db('Restaurant', restaurant_rows)):
+		if inserted:
+			restaurant_ids[row["place_id"]] = inserted["id"]
+			restaurant_index.insert(inserted["id"], row["latitude"], row["longitude"])
+		else:
+			insert_errors[row["place_id"]] = error
+
+	for place_id in needs_logo:
+		if place_id in restaurant_ids:
+			restaurant_enrichment.enqueue(place_id)
+
+	# Step 4: insert every deal of the restaurants that made it
+	deal_rows = []
+	deal_owners = []
+	for i, restaurant in valid.items():
+		place_id = restaurant["place_id"]
+		if place_id not in restaurant_ids:
+			fail(i, f"Failed to add restaurant: {insert_errors.get(place_id)}")
+			continue
+
+		results[i]["restaurant_id"] = restaurant_ids[place_id]
+		for deal in restaurant.get("Deal") or []:
+			try:
+				deal_rows.append(build_deal_row(deal, restaurant_ids[place_id]))
+				deal_owners.append(i)
+			except (KeyError, TypeError, ValueError):
+				fail(i, "Invalid deal, item and date_posted are required")
+
+	for i, (inserted, error) in zip(deal_owners, bulk_insert_in_db('Deal', deal_rows)):
+		if inserted:
+			results[i]["deal_ids"].append(inserted["id"])
+			deal_search_index.add(inserted["id"], inserted["restaurant_id"], inserted["item"], inserted.get("description"))
+			deal_ranker.add(inserted["id"], inserted["restaurant_id"], parse_iso_ms(inserted["date_posted"]), parse_iso_ms(inserted.get("expiry_date")))
+		else:
+			fail(i, f"Failed to add deal: {error}")
+
+	# the new deals only have their user details after a reload through the RPC
+	if deal_rows:
+		deal_snapshot.invalidate()
+	for place_id in place_ids:
+		invalidate_restaurant_details(place_id=place_id)
+
+	return results
+
+@app.route('/bulk_add_restaurant_deals', methods=["POST"])
+def bulk_add_restaurant_deals():
+	"""Adds many restaurants and their deals at once, from a JSON array or NDJSON.
+
+	Every restaurant has the same shape as in /add_restaurant_deal, except all
+	of its deals are added, and gets its own result in the response.
+	"""
+	try:
+		restaurants = parse_bulk_upload()
+
+		if len(restaurants) > MAX_BULK_ROWS:
+			return jsonify({"success": False, "message": f"Error: At most {MAX_BULK_ROWS} restaurants per request"})
+
+		logger.info(f"Received bulk add request for {len(restaurants)} restaurants")
+		results = bulk_add_restaurant_deals_in_db(restaurants)
+		succeeded = sum(result["success"] for result in results)
+		logger.info(f"Bulk added {succeeded} of {len(results)} restaurants")
+
+		return json_stream.json_response({"success": True, "succeeded": succeeded, "failed": len(results) - succeeded, "results": results})
+
+	except Exception as e:
+		error_message = str(e)
+		logger.error(f"Error occurred at bulk_add_restaurant_deals: {error_message}", exc_info=True)
+		return jsonify({"success": False, "message": "Error: Could not add the restaurant deals"})
+
 
 @app.route('/search_nearby_restaurants', methods=["GET"])
 def nearby_search():
@@ -487,22 +1062,126 @@ def nearby_search():
 		latitude = float(request.args.get('latitude'))
 		longitude = float(request.args.get('longitude'))
 		radius = float(request.args.get('radius'))
+		# stop fetching pages once this many restaurants are found. Without a limit only the first
+		# page is sent, every page after it costs at least NEXT_PAGE_DELAY_SECONDS and its logo lookups
+		limit = request.args.get('limit', type=int)
+		max_pages = None if limit is not None else 1
 
 		logger.info(f"Received request for nearby restaurants with keyword='{keyword}', "
-					f"latitude={latitude}, longitude={longitude}, radius={radius}")
+					f"latitude={latitude}, longitude={longitude}, radius={radius}, limit={limit}")
 
-		nearby_restaurants = google_maps.search_nearby_restaurants(keyword, latitude, longitude, radius)
+		pages = google_maps.iter_nearby_pages(
+			keyword, latitude, longitude, radius, place_image_cache, get_restaurant_image_url, limit, max_pages,
+		)
 
-		logger.info(f"Found {len(nearby_restaurants)} restaurants near ({latitude}, {longitude}) within {radius}m")
-		nearby_restaurants.sort(key=lambda x: haversine(latitude, longitude, x["coordinates"]["latitude"], x["coordinates"]["longitude"]))
+		def stream_pages():
+			# each page goes out as soon as it's ready, not after the wait for the next one
+			for page in pages:
+				yield from page
+				yield json_stream.FLUSH
 
-		return jsonify(nearby_restaurants)
+		return json_stream.streaming_response(stream_pages())
 
 	except Exception as e:
 		error_message = str(e)
 		logger.error(f"Error occurred at nearby_search: {error_message}", exc_info=True)
 		return jsonify({"error": "An error occurred while searching for nearby restaurants"})
 
+def search_deals_given_filters(query, user_lat, user_long, radius, user_id, limit):
+	"""Gets the deals within the radius whose item or description best match the query.
+
+	Text relevance is scaled down with distance, up to SEARCH_DISTANCE_WEIGHT
+	at the edge of the radius. Restaurants come back ordered by their best
+	deal, each with only its matching deals.
+	"""
+	snapshot = deal_snapshot.ensure_fresh()
+
+	nearby = restaurant_index.query_radius(user_lat, user_long, radius)
+	weights = {restaurant_id: 1 - SEARCH_DISTANCE_WEIGHT * min(distance / radius, 1) for restaurant_id, distance in nearby}
+
+	with metrics.timed("search_deals.query"):
+		results = deal_search_index.search(query, weights, limit)
+
+	restaurant_ids = list(dict.fromkeys(restaurant_id for _, _, restaurant_id in results))
+	return snapshot.materialize(restaurant_ids, user_overlays.get(user_id), {deal_id for _, deal_id, _ in results})
+
+@app.route('/search_deals', methods=["GET"])
+def search_deals():
+	"""Full-text search over our own deals near the user, e.g. "wings" or "half price pizza"."""
+	try:
+		query = request.args.get('query', '')
+		latitude = float(request.args.get('latitude'))
+		longitude = float(request.args.get('longitude'))
+		radius = float(request.args.get('radius'))
+		user_id = request.args.get('user_id')
+		limit = request.args.get('limit', SEARCH_DEFAULT_RESULTS, type=int)
+		logger.info(f"Searching deals for '{query}' at lat: {latitude}, long: {longitude}, radius: {radius}")
+
+		if not query.strip():
+			return jsonify({"error": "query is required"})
+
+		if radius <= 0:
+			return jsonify({"error": "radius must be positive"})
+
+		if limit <= 0 or limit > MAX_SEARCH_RESULTS:
+			return jsonify({"error": f"limit must be between 1 and {MAX_SEARCH_RESULTS}"})
+
+		return json_stream.json_response(search_deals_given_filters(query, latitude, longitude, radius, user_id, limit))
+
+	except Exception as e:
+		error_message = str(e)
+		logger.error(f"Error occurred at search_deals: {error_message}", exc_info=True)
+		return jsonify({"error": "An error occurred while searching deals"})
+
+def get_top_deals_given_filters(user_lat, user_long, radius, user_id, limit):
+	"""Gets the `limit` best ranked deals within the radius, best first.
+
+	Each deal comes back in its restaurant, so a restaurant with several top
+	deals appears once per deal.
+	"""
+	snapshot = deal_snapshot.ensure_fresh()
+
+	nearby = restaurant_index.query_radius(user_lat, user_long, radius)
+	with metrics.timed("top_deals.rank"):
+		ranked = deal_ranker.top(nearby, radius, limit, int(time.time() * 1000))
+
+	restaurant_ids = list(dict.fromkeys(restaurant_id for _, _, restaurant_id in ranked))
+	restaurants = {
+		restaurant["id"]: restaurant
+		for restaurant in snapshot.materialize(restaurant_ids, user_overlays.get(user_id), {deal_id for _, deal_id, _ in ranked})
+	}
+
+	top_deals = []
+	for _, deal_id, restaurant_id in ranked:
+		restaurant = restaurants.get(restaurant_id)
+		deal = next((deal for deal in restaurant["Deal"] if deal["id"] == deal_id), None) if restaurant else None
+		# gone from the snapshot since it was ranked
+		if deal is None:
+			continue
+		top_deals.append({**restaurant, "Deal": [deal]})
+	return top_deals
+
+@app.route('/top_deals', methods=["GET"])
+def top_deals():
+	"""Gets the best deals near the user, ranked by votes, recency, time to expiry and distance."""
+	try:
+		latitude = float(request.args.get('latitude'))
+		longitude = float(request.args.get('longitude'))
+		radius = float(request.args.get('radius'))
+		user_id = request.args.get('user_id')
+		limit = request.args.get('limit', TOP_DEALS_DEFAULT, type=int)
+		logger.info(f"Fetching top deals for lat: {latitude}, long: {longitude}, radius: {radius}, limit: {limit}")
+
+		if limit <= 0 or limit > MAX_TOP_DEALS:
+			return jsonify({"error": f"limit must be between 1 and {MAX_TOP_DEALS}"})
+
+		return json_stream.json_response(get_top_deals_given_filters(latitude, longitude, radius, user_id, limit))
+
+	except Exception as e:
+		error_message = str(e)
+		logger.error(f"Error occurred at top_deals: {error_message}", exc_info=True)
+		return jsonify({"error": "An error occurred while fetching top deals"})
+
 @app.route('/update_vote', methods=["GET"])
 def update_vote():
 	user_id = request.args.get('user_id')
@@ -528,14 +1207,35 @@ def unsave_deal():
 
 	return unmark_deal_saved_in_db(deal_id, user_id)
 
+@app.route('/deal_actions', methods=["POST"])
+def deal_actions():
+	"""Applies a batch of save, unsave and vote actions for a user."""
+	try:
+		data = request.get_json()
+		user_id = data.get("user_id")
+		actions = data.get("actions")
+
+		if not user_id or not isinstance(actions, list):
+			return jsonify({"success": False, "message": "Error: user_id and a list of actions are required"})
+
+		if len(actions) > MAX_DEAL_ACTIONS:
+			return jsonify({"success": False, "message": f"Error: At most {MAX_DEAL_ACTIONS} actions per request"})
+
+		results = apply_deal_actions(user_id, actions)
+		return jsonify({"success": True, "results": results})
+
+	except Exception as e:
+		error_message = str(e)
+		logger.error(f"Error occurred in deal_actions: {error_message}", exc_info=True)
+		return jsonify({"success": False, "message": "Error: Could not apply deal actions"})
+
 @app.route("/get_saved_deals", methods=["GET"])
 def get_saved_deals():
 	user_id = request.args.get("user_id")
 
 	saved_deals = get_user_saved_restaurant_deals(user_id)
-	restaurants = process_and_filter_restaurant_deals(saved_deals)
 
-	return jsonify(restaurants)
+	return json_stream.streaming_response(saved_deals)
 
 @app.route('/delete_deal', methods=["GET"])
 def delete_deal():
@@ -611,6 +1311,10 @@ def create_new_user_account():
 		# TODO: should have a better return object (for one user_id should not be in "message")
 		return jsonify({"success": True, "message": user_id})
 
+	except PasswordHasherBusy as e:
+		logger.warning(f"Rejected create_new_user_account: {str(e)}")
+		return jsonify({"success": False, "message": "Error: Server is busy, please try again"}), 503
+
 	except Exception as e:
 		error_message = str(e)
 		logger.error(f"Error occurred in create_new_user_account: {error_message}", exc_info=True)
@@ -618,8 +1322,19 @@ def create_new_user_account():
 
 
 def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    return password_hasher.hash(password)
+
+def rehash_password_if_needed(user_id, password, password_hash):
+	"""Rehashes a just-verified password if its hash was made with a different cost factor."""
+	if not password_hasher.needs_rehash(password_hash):
+		return
+
+	try:
+		supabase.from_('User').update({'password_hash': hash_password(password)}).eq('id', user_id).execute()
+		logger.info(f"Rehashed password for user {user_id} with cost {BCRYPT_ROUNDS}")
+	except Exception as e:
+		# the old hash still works, try again on the next login
+		logger.error(f"Failed to rehash password for user {user_id}: {str(e)}", exc_info=True)
 
 @app.route('/login', methods=["POST"])
 def login():
@@ -670,6 +1385,10 @@ def login():
                 "message": "ERROR: Invalid username or password"
             })
 
+		rehash_password_if_needed(user['id'], password, user['password_hash'])
+
+		upvote, downvote = vote_counters.get(user['id'])
+
 		# Prepare the full user object to return
 		user_response = {
 			"id": user['id'],
@@ -678,8 +1397,8 @@ def login():
 			"firstName": user['first_name'],
 			"lastName": user['last_name'],
 			"email": user['email'],
-			"upvote": get_user_upvote(user['id']),
-			"downvote": get_user_downvote(user['id']),
+			"upvote": upvote,
+			"downvote": downvote,
 		}
 
 		logger.info(f"Successfully logged in user: {username}")
@@ -691,6 +1410,10 @@ def login():
 			"user": user_response
 		})
 
+	except PasswordHasherBusy as e:
+		logger.warning(f"Rejected login: {str(e)}")
+		return jsonify({"success": False, "message": "ERROR: Server is busy, please try again"}), 503
+
 	except Exception as e:
 		error_message = str(e)
 		logger.error(f"Error occurred in login: {error_message}", exc_info=True)
@@ -703,7 +1426,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 #     print("THIS IS USED TO CHANGE PREVIOUSLY HASHED PASSWORDS")
 #     print("plain password: ", plain_password)
 #     print("THIS IS THE HASHED SALT: ", hash_password(plain_password))
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return password_hasher.verify(plain_password, hashed_password)
 
 @app.route('/change_password', methods=["POST"])
 def change_password():
@@ -751,11 +1474,74 @@ def change_password():
 
         return jsonify({"success": True, "message": "Password updated successfully"})
 
+    except PasswordHasherBusy as e:
+        logger.warning(f"Rejected change_password: {str(e)}")
+        return jsonify({"success": False, "message": "Error: Server is busy, please try again"}), 503
+
     except Exception as e:
         error_message = str(e)
         logger.error(f"Error occurred in change_password: {error_message}", exc_info=True)
         return jsonify({"success": False, "message": "Error: Unable to change password"})
 
+def get_restaurants_with_deals_in_db(place_ids):
+    """Fetches the restaurants with the place_ids and their live deals in one embedded select, keyed by place_id."""
+    response = (
+        supabase.from_("Restaurant")
+        .select("*, Deal(*)")
+        .in_("place_id", place_ids)
+        .eq("Deal.is_removed", False)
+        .execute()
+    )
+    return {restaurant["place_id"]: restaurant for restaurant in response.data}
+
+def load_restaurant_details(place_ids):
+    """Returns {place_id: unformatted restaurant or None} for the place_ids, from the cache where possible."""
+    details = {}
+    missing = []
+    for place_id in place_ids:
+        restaurant = restaurant_details.get(place_id)
+        if restaurant is MISSING:
+            missing.append(place_id)
+        else:
+            details[place_id] = restaurant
+
+    metrics.increment("restaurant_cache.hits", len(details))
+    metrics.increment("restaurant_cache.misses", len(missing))
+
+    for i in range(0, len(missing), IN_FILTER_CHUNK_SIZE):
+        chunk = missing[i:i + IN_FILTER_CHUNK_SIZE]
+        restaurants = get_restaurants_with_deals_in_db(chunk)
+
+        for place_id in chunk:
+            # unknown places are cached too, add_restaurant_deal drops them once they exist
+            restaurant = restaurants.get(place_id)
+            restaurant_details.set(place_id, restaurant)
+            if restaurant:
+                restaurant_place_ids[restaurant["id"]] = place_id
+            details[place_id] = restaurant
+
+    return details
+
+def invalidate_restaurant_details(place_id=None, restaurant_id=None):
+    """Drops the cached details of the restaurant, by place_id or restaurant id."""
+    if place_id is None:
+        place_id = restaurant_place_ids.get(restaurant_id)
+    if place_id is not None:
+        restaurant_details.pop(place_id)
+
+def format_restaurant_detail(restaurant):
+    """Formats a copy of a cached restaurant row, leaving the cached one untouched."""
+    restaurant = dict(restaurant)
+    restaurant["coordinates"] = {
+        "latitude": restaurant["latitude"],
+        "longitude": restaurant["longitude"]
+    }
+
+    # expired deals are dropped on every read, not just when the row was fetched
+    formatted_deals = map(format_deal, map(dict, restaurant["Deal"]))
+    restaurant["Deal"] = list(filter(None, formatted_deals))
+    return restaurant
+
 @app.route('/get_restaurant', methods=["GET"])
 def get_restaurant():
     """Get restaurant details from Supabase given a place_id."""
@@ -763,42 +1549,46 @@ def get_restaurant():
         place_id = request.args.get("place_id")
         logger.info(f"Fetching deals for restaurant: {place_id}")
 
-        # Step 1: Search the restaurant table by place_id
-        response = supabase.from_("Restaurant").select("*").eq("place_id", place_id).execute()
-        # Check if any rows were returned
-        if not response.data:
+        restaurant = restaurant_flight.do(place_id, load_restaurant_details, [place_id])[place_id]
+        if not restaurant:
             logger.warning(f"No restaurant found with place_id: {place_id}")
             return jsonify({"restaurant": None}) # No Content
 
+        return jsonify({"restaurant": format_restaurant_detail(restaurant)})
 
-        # Get the first restaurant from the returned list
-        restaurant = response.data[0]
-        restaurant_id = restaurant["id"]
+    except Exception as e:
+        error_message = str(e)
+        logger.error(f"Error occurred: {error_message}", exc_info=True)
+        return jsonify({"error": "An error occurred while fetching restaurant deals"})
+
+@app.route('/get_restaurants', methods=["GET"])
+def get_restaurants():
+    """Gets the details of several restaurants at once given comma separated place_ids.
 
-        # Format restaurant obj
-        restaurant["coordinates"] = {
-            "latitude": restaurant["latitude"],
-            "longitude": restaurant["longitude"]
-        }
+    Restaurants are returned once each in the order of place_ids, null for unknown places.
+    """
+    try:
+        place_ids = list(dict.fromkeys(filter(None, request.args.get("place_ids", "").split(","))))
+
+        if not place_ids:
+            return jsonify({"error": "place_ids is required"})
 
-        # Step 2: Fetch all deals from the deals table that match restaurant_id
-        deals_response = supabase.from_("Deal").select("*").eq("restaurant_id", restaurant_id).eq("is_removed", False).execute()
-        raw_deals = deals_response.data if deals_response.data else []
+        if len(place_ids) > MAX_BATCH_RESTAURANTS:
+            return jsonify({"error": f"At most {MAX_BATCH_RESTAURANTS} place_ids per request"})
 
-        # format deals obj
-        formatted_deals = map(format_deal, raw_deals)
-        valid_deals = list(filter(None, formatted_deals))
+        details = load_restaurant_details(place_ids)
+        restaurants = [format_restaurant_detail(details[place_id]) if details[place_id] else None for place_id in place_ids]
 
-        # Step 3: Attach deals to the restaurant object and return the result
-        restaurant["Deal"] = valid_deals
-        return jsonify({"restaurant": restaurant})
+        return json_stream.json_response({"restaurants": restaurants})
 
     except Exception as e:
         error_message = str(e)
-        logger.error(f"Error occurred: {error_message}", exc_info=True)
-        return jsonify({"error": "An error occurred while fetching restaurant deals"})
+        logger.error(f"Error occurred in get_restaurants: {error_message}", exc_info=True)
+        return jsonify({"error": "An error occurred while fetching restaurants"})
 
 GPU_SERVER_URL = "http://ece-nebula10.eng.uwaterloo.ca:8000"
+# the model can take a while to read a poster
+GPU_GENERATE_TIMEOUT_SECONDS = float(os.getenv("GPU_GENERATE_TIMEOUT_SECONDS", 120))
 
 # this is just to test if the server "is not up"
 # GPU_SERVER_URL = "http://ece-nebula10.eng.uwaterloo.ca:5000"
@@ -807,7 +1597,7 @@ GPU_SERVER_URL = "http://ece-nebula10.eng.uwaterloo.ca:8000"
 def proxy_generate():
     try:
         # forward request to the GPU server
-        response = requests.post(GPU_SERVER_URL + "/generate", json=request.json)
+        response = http_client.post(GPU_SERVER_URL + "/generate", json=request.json, upstream="gpu.generate", timeout=(http_client.HTTP_CONNECT_TIMEOUT_SECONDS, GPU_GENERATE_TIMEOUT_SECONDS))
         logger.warning(response)
 
         return jsonify(response.json()), response.status_code
@@ -818,7 +1608,7 @@ def proxy_generate():
 def proxy_handshake():
     try:
         # attempt to call the GPU service handshake endpoint
-        response = requests.get(GPU_SERVER_URL, timeout=5) # timeout in 5 seconds
+        response = http_client.get(GPU_SERVER_URL, upstream="gpu.handshake", timeout=5, retries=0) # timeout in 5 seconds
         if response.status_code == 200:
             return jsonify({"gpu_status": True}), 200
         else:
@@ -828,6 +1618,11 @@ def proxy_handshake():
         logger.warning(f"error: {e}")
         return jsonify({"gpu_status": False, "error": str(e)}), 503
 
+@app.route('/metrics', methods=["GET"])
+def get_metrics():
+	"""Returns this worker's counters and timings."""
+	return jsonify(metrics.snapshot())
+
 @app.route('/')
 def index():
 	return "Successfully connected "
@@ -0,0 +1,47 @@
+import threading
+import metrics
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs at most one call per key at a time, concurrent callers with the same key share its result.
+
+    Callers that joined an in-flight call are counted in the
+    `single_flight.<name>.deduplicated` metric and the `single_flight.deduplicated` total.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Returns fn(*args, **kwargs), or the result of the identical call already running."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.increment(f"single_flight.{self.name}.deduplicated")
+            metrics.increment("single_flight.deduplicated")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,99 @@
+import math
+import threading
+from distance import bounding_box, longitude_ranges, within_radius
+
+# Grid cell edge in degrees, ~1.1km of latitude. Small enough that a typical
+# map radius touches a handful of cells, large enough to keep the cell map tiny.
+CELL_SIZE_DEG = 0.01
+
+class RestaurantIndex:
+    """In-memory uniform lat/long grid over restaurant coordinates.
+
+    Radius queries only visit the cells overlapping the search circle's bounding
+    box, so their cost tracks the number of nearby restaurants instead of the
+    total number of restaurants.
+    """
+
+    def __init__(self, cell_size_deg=CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self._cells = {}  # (row, col) -> {restaurant_id: (latitude, longitude)}
+        self._locations = {}  # restaurant_id -> (row, col)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._locations)
+
+    def _cell_for(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_size_deg), math.floor(longitude / self.cell_size_deg))
+
+    def rebuild(self, restaurants):
+        """Replaces the index contents with an iterable of (id, latitude, longitude)."""
+        cells = {}
+        locations = {}
+        for restaurant_id, latitude, longitude in restaurants:
+            if latitude is None or longitude is None:
+                continue
+            cell = self._cell_for(latitude, longitude)
+            cells.setdefault(cell, {})[restaurant_id] = (latitude, longitude)
+            locations[restaurant_id] = cell
+
+        with self._lock:
+            self._cells = cells
+            self._locations = locations
+
+    def insert(self, restaurant_id, latitude, longitude):
+        """Adds or moves a single restaurant without rebuilding the whole index."""
+        if latitude is None or longitude is None:
+            return
+
+        cell = self._cell_for(latitude, longitude)
+        with self._lock:
+            previous_cell = self._locations.get(restaurant_id)
+            if previous_cell is not None and previous_cell != cell:
+                self._cells.get(previous_cell, {}).pop(restaurant_id, None)
+            self._cells.setdefault(cell, {})[restaurant_id] = (latitude, longitude)
+            self._locations[restaurant_id] = cell
+
+    def candidates(self, latitude, longitude, radius):
+        """Returns (id, latitude, longitude) for restaurants in cells overlapping the radius.
+
+        This is a superset of the restaurants within `radius` meters; callers
+        apply the exact distance check.
+        """
+        min_lat, max_lat, min_long, max_long = bounding_box(latitude, longitude, radius)
+        min_row = self._cell_for(min_lat, 0)[0]
+        max_row = self._cell_for(max_lat, 0)[0]
+
+        with self._lock:
+            cells = self._cells
+            keys = []
+            # a box crossing the antimeridian is two column ranges, one at each end of the grid
+            for low, high in longitude_ranges(min_long, max_long):
+                min_col = self._cell_for(0, low)[1]
+                max_col = self._cell_for(0, high)[1]
+                num_cells = (max_row - min_row + 1) * (max_col - min_col + 1)
+
+                # a huge radius covers more grid cells than are populated, walk those instead
+                if num_cells > len(cells):
+                    keys.extend(key for key in cells if min_row <= key[0] <= max_row and min_col <= key[1] <= max_col)
+                else:
+                    keys.extend((row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1))
+
+            result = []
+            for key in keys:
+                cell = cells.get(key)
+                if cell:
+                    result.extend((restaurant_id, lat, long) for restaurant_id, (lat, long) in cell.items())
+
+        return result
+
+    def query_radius(self, latitude, longitude, radius):
+        """Returns [(restaurant_id, distance)] for restaurants within `radius` meters."""
+        candidates = self.candidates(latitude, longitude, radius)
+        if not candidates:
+            return []
+
+        restaurant_ids, latitudes, longitudes = zip(*candidates)
+        indices, distances = within_radius(latitude, longitude, latitudes, longitudes, radius)
+
+        return [(restaurant_ids[i], float(d)) for i, d in zip(indices.tolist(), distances.tolist())]
@@ -0,0 +1,84 @@
+import logging
+import threading
+from datetime import datetime
+import pytz
+import metrics
+
+logger = logging.getLogger('werkzeug')
+
+# Deals with this many more downvotes than upvotes are taken down
+BAD_KARMA_THRESHOLD = 10
+
+def has_bad_karma(deal):
+    """Returns True if the deal has been downvoted enough to be removed."""
+    return deal["num_downvote"] - deal["num_upvote"] >= BAD_KARMA_THRESHOLD
+
+class DealSweeper:
+    """Background job that flags expired and bad-karma deals as removed.
+
+    Removals are written with one `in_()` update per batch, so read paths
+    only have to filter these deals out and never write themselves.
+    """
+
+    def __init__(self, supabase, snapshot, interval_seconds, batch_size=200):
+        self._supabase = supabase
+        self._snapshot = snapshot
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def find_expired_deal_ids(self):
+        """Fetches the ids of deals past their expiry_date that are not removed yet."""
+        now = datetime.now(tz=pytz.UTC).isoformat()
+        response = self._supabase.from_('Deal').select('id') \
+            .eq('is_removed', False).lt('expiry_date', now).execute()
+
+        return [row["id"] for row in response.data]
+
+    def find_bad_karma_deal_ids(self):
+        """Finds deals with bad karma using the vote totals in the deal snapshot."""
+        return self._snapshot.ensure_fresh().find_deal_ids(lambda deal: deal.has_bad_karma())
+
+    def remove(self, deal_ids):
+        """Marks the deals as removed in batches, returns how many rows were updated."""
+        removed = 0
+        for start in range(0, len(deal_ids), self.batch_size):
+            batch = deal_ids[start:start + self.batch_size]
+            response = self._supabase.table("Deal").update({"is_removed": True}).in_("id", batch).execute()
+            removed += len(response.data)
+
+            for deal_id in batch:
+                self._snapshot.remove_deal(deal_id)
+
+        return removed
+
+    def sweep(self):
+        """Runs one sweep and records its duration and row count."""
+        with metrics.timed("sweeper.sweep"):
+            deal_ids = list(dict.fromkeys(self.find_expired_deal_ids() + self.find_bad_karma_deal_ids()))
+            removed = self.remove(deal_ids)
+
+        metrics.increment("sweeper.sweeps")
+        metrics.increment("sweeper.deals_removed", removed)
+        if removed:
+            logger.info(f"Deal sweeper removed {removed} expired or bad karma deals")
+
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                metrics.increment("sweeper.errors")
+                logger.error(f"Deal sweep failed: {str(e)}", exc_info=True)
+
+    def start(self):
+        """Starts sweeping every interval_seconds on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="deal-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,53 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl_seconds.
+
+    None is a valid cached value, use `MISSING` to tell a miss apart.
+    """
+
+    def __init__(self, maxsize, ttl_seconds):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        """Returns the cached value, or `default` if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds=None):
+        """Caches value for ttl_seconds, or the cache's default TTL."""
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Drops the key if it is cached."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,149 @@
+import logging
+import threading
+import metrics
+
+logger = logging.getLogger('werkzeug')
+
+# A vote that keeps failing is dropped after this many flushes so it can't block the queue
+MAX_FLUSH_ATTEMPTS = 3
+
+def _split(batch):
+    """Turns {(user_id, deal_id): vote_type} into the writer's (upserts, deletes)."""
+    upserts = []
+    deletes = {}
+    for (user_id, deal_id), vote_type in batch.items():
+        if vote_type == "NEUTRAL":
+            deletes.setdefault(user_id, []).append(deal_id)
+        else:
+            upserts.append({"user_id": user_id, "deal_id": deal_id, "user_vote": vote_type})
+    return upserts, deletes
+
+class VoteBuffer:
+    """Write-behind queue for votes, coalesced by (user_id, deal_id).
+
+    Only the latest vote per user and deal is kept, and NEUTRAL means the vote
+    row is deleted. The queue is flushed to Supabase on a short interval or as
+    soon as it holds `max_pending` votes, with one upsert for every new vote
+    and one delete per user for the cleared ones.
+    """
+
+    def __init__(self, writer, flush_interval_seconds=1.0, max_pending=500):
+        self._writer = writer  # writer(upserts, deletes) does the Supabase calls
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self._pending = {}  # (user_id, deal_id) -> vote_type
+        self._in_flight = {}  # the batch currently being written
+        self._attempts = {}  # (user_id, deal_id) -> failed flushes so far
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def enqueue(self, user_id, deal_id, vote_type):
+        """Queues a vote, replacing any vote for the same deal still waiting to be written."""
+        key = (user_id, deal_id)
+        with self._lock:
+            if key in self._pending:
+                metrics.increment("votes.coalesced")
+            self._pending[key] = vote_type
+            self._attempts.pop(key, None)
+            full = len(self._pending) >= self.max_pending
+
+        metrics.increment("votes.enqueued")
+        if full:
+            self._wake.set()
+
+    def pending_votes(self, user_id):
+        """Returns {deal_id: vote_type} for the user's votes that are not written yet."""
+        with self._lock:
+            votes = {}
+            for queue in (self._in_flight, self._pending):
+                votes.update((deal_id, vote) for (pending_user, deal_id), vote in queue.items() if pending_user == user_id)
+            return votes
+
+    def flush(self):
+        """Writes every queued vote to Supabase, returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+
+            if not batch:
+                return 0
+
+            try:
+                with metrics.timed("votes.flush"):
+                    self._writer(*_split(batch))
+                self._clear_attempts(batch)
+                written = len(batch)
+            except Exception as e:
+                metrics.increment("votes.flush_errors")
+                logger.warning(f"Failed to flush {len(batch)} votes, retrying one at a time: {str(e)}")
+                written = self._write_one_by_one(batch)
+            finally:
+                with self._lock:
+                    self._in_flight = {}
+
+            metrics.increment("votes.flushed", written)
+            return written
+
+    def _write_one_by_one(self, batch):
+        """Writes each vote on its own so a bad one doesn't take the others down, requeues the failures."""
+        failed = {}
+        for key, vote_type in batch.items():
+            try:
+                self._writer(*_split({key: vote_type}))
+                self._clear_attempts([key])
+            except Exception as e:
+                logger.error(f"Failed to write vote {vote_type} by user {key[0]} on deal {key[1]}: {str(e)}", exc_info=True)
+                failed[key] = vote_type
+
+        if failed:
+            self._requeue(failed)
+        return len(batch) - len(failed)
+
+    def _clear_attempts(self, keys):
+        with self._lock:
+            for key in keys:
+                self._attempts.pop(key, None)
+
+    def _requeue(self, batch):
+        with self._lock:
+            for key, vote_type in batch.items():
+                # a newer vote queued during the flush wins
+                if key in self._pending:
+                    continue
+
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= MAX_FLUSH_ATTEMPTS:
+                    self._attempts.pop(key, None)
+                    metrics.increment("votes.dropped")
+                    logger.error(f"Dropping vote {vote_type} by user {key[0]} on deal {key[1]} after {attempts} failed flushes")
+                    continue
+
+                self._pending[key] = vote_type
+                self._attempts[key] = attempts
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        """Starts flushing on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vote-buffer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the flush thread and writes whatever is still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval_seconds * 5)
+        self.flush()
@@ -0,0 +1,98 @@
+import logging
+import threading
+from collections import defaultdict
+import metrics
+
+logger = logging.getLogger('werkzeug')
+
+VOTE_INDEX = {"UPVOTE": 0, "DOWNVOTE": 1}
+
+def count_votes(votes):
+    """Returns [upvotes, downvotes] for an iterable of vote types."""
+    counts = [0, 0]
+    for vote in votes:
+        if vote in VOTE_INDEX:
+            counts[VOTE_INDEX[vote]] += 1
+    return counts
+
+class VoteCounterStore:
+    """Cached number of upvotes and downvotes each user has cast.
+
+    Counters are loaded on first use, moved incrementally as the user votes,
+    and periodically reconciled against the Vote table in bulk.
+    """
+
+    def __init__(self, user_loader, bulk_loader, reconcile_seconds):
+        self._user_loader = user_loader  # user_id -> {deal_id: vote_type}
+        self._bulk_loader = bulk_loader  # user_ids or None -> iterable of (user_id, vote_type)
+        self.reconcile_seconds = reconcile_seconds
+        self._counts = {}  # user_id -> [upvotes, downvotes]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, user_id):
+        """Returns (upvotes, downvotes) for the user, loading them with one query on a miss."""
+        with self._lock:
+            counts = self._counts.get(user_id)
+            if counts is not None:
+                metrics.increment("vote_counters.hits")
+                return tuple(counts)
+
+        metrics.increment("vote_counters.misses")
+        counts = count_votes(self._user_loader(user_id).values())
+        with self._lock:
+            self._counts.setdefault(user_id, counts)
+            return tuple(self._counts[user_id])
+
+    def apply(self, user_id, previous_vote, new_vote):
+        """Moves one of the user's votes from previous_vote to new_vote."""
+        with self._lock:
+            counts = self._counts.get(user_id)
+            if counts is None or previous_vote == new_vote:
+                return
+            if previous_vote in VOTE_INDEX:
+                counts[VOTE_INDEX[previous_vote]] -= 1
+            if new_vote in VOTE_INDEX:
+                counts[VOTE_INDEX[new_vote]] += 1
+
+    def rebuild(self, user_ids=None):
+        """Recounts the given users, or every user with a vote, from the Vote table in bulk."""
+        with metrics.timed("vote_counters.rebuild"):
+            totals = defaultdict(lambda: [0, 0])
+            for user_id, vote in self._bulk_loader(user_ids):
+                if vote in VOTE_INDEX:
+                    totals[user_id][VOTE_INDEX[vote]] += 1
+
+            with self._lock:
+                if user_ids is None:
+                    self._counts = dict(totals)
+                else:
+                    for user_id in user_ids:
+                        self._counts[user_id] = totals.get(user_id, [0, 0])
+
+        return len(totals)
+
+    def reconcile(self):
+        """Recounts every cached user, fixing any drift from votes written elsewhere."""
+        with self._lock:
+            user_ids = list(self._counts)
+
+        if user_ids:
+            self.rebuild(user_ids)
+
+    def _run(self):
+        while not self._stop.wait(self.reconcile_seconds):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Failed to reconcile vote counters: {str(e)}", exc_info=True)
+
+    def start(self):
+        """Starts reconciling every reconcile_seconds on a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vote-counters", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -4,6 +4,9 @@ import json
 from typing import Optional, Literal
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import time
 from transformers import MllamaForConditionalGeneration, AutoProcessor
 import torch
 from PIL import Image
@@ -46,6 +49,14 @@ QUERY_PARAMS = "?alt=media"
 
 FOLDERPATH = f"/mnt/slurm_nfs/mllm_446/data"
 
+# one keep-alive session for every image download from Firebase Storage
+IMAGE_DOWNLOAD_TIMEOUT_SECONDS = (3, 30)
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504)),
+))
+
 class ImageRequest(BaseModel):
     image_id: str
 
@@ -104,7 +115,9 @@ def generate(
         filepath = f"{FOLDERPATH}/{image_request.image_id}"
         print(filepath)
 
-        response = requests.get(url)
+        start = time.perf_counter()
+        response = http_session.get(url, timeout=IMAGE_DOWNLOAD_TIMEOUT_SECONDS)
+        print(f"Image download took {(time.perf_counter() - start) * 1000:.0f}ms")
         # if response.status_code != 200:
         #     print(f"failed response content: {response.content}")
 
@@ -6,6 +6,9 @@ import json
 import os
 from PIL import Image
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import time
 
 # pip install ollama
 from ollama import chat
@@ -36,6 +39,14 @@ FILE_PATH = "deal_images%2F"
 QUERY_PARAMS = "?alt=media"
 FOLDERPATH = "/mnt/slurm_nfs/mllm_446/data"
 
+# one keep-alive session for every image download from Firebase Storage
+IMAGE_DOWNLOAD_TIMEOUT_SECONDS = (3, 30)
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504)),
+))
+
 class ImageRequest(BaseModel):
     image_id: str
 
@@ -69,7 +80,9 @@ def generate(request: Request, image_request: ImageRequest):
     # download locally from firebase
     url = f"{BASE_URL}{FILE_PATH}{image_request.image_id}{QUERY_PARAMS}"
     local_path = os.path.join(FOLDERPATH, image_request.image_id)
-    resp = requests.get(url)
+    start = time.perf_counter()
+    resp = http_session.get(url, timeout=IMAGE_DOWNLOAD_TIMEOUT_SECONDS)
+    print(f"Image download took {(time.perf_counter() - start) * 1000:.0f}ms")
     if resp.status_code != 200:
         raise HTTPException(
             status_code=400,